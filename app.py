@@ -3,11 +3,22 @@ import json
 import os
 import time
 from auth import check_login, init_auth
-from college_manager import CollegeManager
-from file_manager import FileManager
+from college_manager import CollegeManager, derived_cache
+from college_aggregates import (
+    NAME_LABEL, STUDENT_COLUMNS, chart_frame, college_frame, export_frame
+)
+from college_import import read_import_file, parse_import_frame
+from college_records import CollegeTable
+from file_manager import FileManager, format_size
+from report_cache import XLSX_MIME, ReportCache
+import perf_metrics
+from perf_metrics import timed
 import pandas as pd
-import base64
-from io import BytesIO
+
+# عدد الملفات المعروضة في كل صفحة من صفحة إدارة الملفات
+FILES_PER_PAGE = 50
+# عدد الكليات المعروضة في كل صفحة من قائمة الكليات
+COLLEGES_PER_PAGE = 20
 
 # Set page config
 st.set_page_config(
@@ -64,32 +75,34 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def to_excel(df):
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=True, sheet_name='Sheet1')
-    writer.close()
-    processed_data = output.getvalue()
-    return processed_data
-
-def get_table_download_link(df, filename, text):
-    """Generates a link allowing the data in a given panda dataframe to be downloaded"""
-    val = to_excel(df)
-    b64 = base64.b64encode(val)
-    return f'<a href="data:application/octet-stream;base64,{b64.decode()}" download="{filename}">{text}</a>'
-
-def export_stats_to_excel(stats_df, filename):
-    """تصدير الإحصائيات إلى ملف Excel"""
-    excel_data = to_excel(stats_df)
-    b64 = base64.b64encode(excel_data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">تحميل التقرير بصيغة Excel</a>'
-    return href
+
+def excel_report_button(report_type, cache_key, build_frame, filename):
+    """
+    زر تقرير Excel: يُنشأ التقرير (أو يُقرأ من ذاكرة التقارير على القرص)
+    عند الضغط فقط، ثم يُعرض زر التحميل بالملف المحفوظ
+    """
+    if st.button("تحميل التقرير بصيغة Excel", key=f"report_{report_type}"):
+        try:
+            with st.spinner("جاري تحضير التقرير..."):
+                path = st.session_state.report_cache.get(report_type, cache_key, build_frame)
+            with open(path, 'rb') as f:
+                st.download_button(
+                    "اضغط هنا للتحميل", f, file_name=filename, mime=XLSX_MIME,
+                    key=f"report_download_{report_type}"
+                )
+        except Exception as e:
+            st.error(f"خطأ في إنشاء التقرير: {str(e)}")
 
 # Initialize managers
 if 'college_manager' not in st.session_state:
     st.session_state.college_manager = CollegeManager()
 if 'file_manager' not in st.session_state:
     st.session_state.file_manager = FileManager()
+if 'report_cache' not in st.session_state:
+    st.session_state.report_cache = ReportCache('data/reports')
+
+# كتابة ملفات المقاييس (data/metrics.json و data/metrics.prom) دورياً
+perf_metrics.start_exporter()
 
 # Initialize authentication
 init_auth()
@@ -108,19 +121,169 @@ def show_department_dialog(college_name=None, departments=None):
 
 def create_stats_dataframe(colleges):
     """إنشاء DataFrame للإحصائيات العامة"""
-    data = []
-    for college in colleges:
-        data.append({
-            "الكلية": college['name'],
-            "إجمالي الطلاب": college['students_count'],
-            "الطلاب الأجانب": college.get('foreign_students', 0),
-            "طلاب الدراسات العليا": college.get('graduate_students', 0),
-            "طلاب الأقسام الداخلية": college.get('dorm_students', 0),
-            "طلاب المسائي": college.get('evening_students', 0),
-            "طلاب المسائي المستضافين": college.get('evening_hosted_students', 0),
-            "عدد الأقسام": len(college.get('departments', []))
-        })
-    return pd.DataFrame(data)
+    return college_frame(CollegeTable.from_colleges(colleges))
+
+
+# الجداول المشتقة تُحسب مرة واحدة لكل إصدار من البيانات (cache_key) وتُشارك
+# بين الجلسات؛ المعامل _manager لا يدخل في مفتاح التخزين المؤقت
+@derived_cache
+@st.cache_data(max_entries=8)
+def cached_stats_dataframe(cache_key, _manager):
+    """جدول الكليات العمودي الذي تُشتق منه المجاميع والرسم والتقرير"""
+    return college_frame(_manager.get_table())
+
+
+@derived_cache
+@st.cache_data(max_entries=32)
+def cached_department_stats(cache_key, college_names, _manager):
+    stats_df = _manager.get_department_stats_frame(list(college_names) if college_names else None)
+    if not stats_df.empty:
+        stats_df.columns = STUDENT_COLUMNS
+    return stats_df
+
+
+@derived_cache
+@st.cache_data(max_entries=8)
+def cached_chart_data(cache_key, _manager):
+    """بيانات رسم توزيع الطلاب: صف لكل كلية وعمود لكل معيار"""
+    return chart_frame(cached_stats_dataframe(cache_key, _manager))
+
+
+def show_college_details(college):
+    """بطاقة الكلية الكاملة مع أزرار التعديل والحذف، تُعرض عند فتح البطاقة فقط"""
+    with st.container():
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            st.markdown(f"""
+                <div class='college-card'>
+                    <h3>{college.name} 🏛️</h3>
+                    <div class='student-stats'>
+                        <div class='stat-card'>
+                            <h4>إجمالي الطلاب</h4>
+                            <p>👥 {college.students_count}</p>
+                        </div>
+                        <div class='stat-card'>
+                            <h4>الطلاب الأجانب</h4>
+                            <p>🌍 {college.foreign_students}</p>
+                        </div>
+                        <div class='stat-card'>
+                            <h4>طلاب الدراسات العليا</h4>
+                            <p>📚 {college.graduate_students}</p>
+                        </div>
+                        <div class='stat-card'>
+                            <h4>طلاب الأقسام الداخلية</h4>
+                            <p>🏠 {college.dorm_students}</p>
+                        </div>
+                        <div class='stat-card'>
+                            <h4>طلاب المسائي</h4>
+                            <p>🌙 {college.evening_students}</p>
+                        </div>
+                        <div class='stat-card'>
+                            <h4>طلاب المسائي المستضافين</h4>
+                            <p>📝 {college.evening_hosted_students}</p>
+                        </div>
+                    </div>
+                    <div class='departments-section'>
+                        <h4>الأقسام 📚</h4>
+                        <ul>
+                            {" ".join([f"<li>{dept}</li>" for dept in college.departments])}
+                        </ul>
+                    </div>
+                </div>
+            """, unsafe_allow_html=True)
+        with col2:
+            if st.button("تعديل", key=f"edit_{college.name}"):
+                st.session_state.editing_college = college
+                st.rerun()
+            if st.button(f"حذف", key=f"del_{college.name}"):
+                with st.spinner("جاري الحذف..."):
+                    st.session_state.college_manager.delete_college(college.name)
+                    time.sleep(0.3)
+                    st.success("تم حذف الكلية بنجاح")
+                    time.sleep(0.3)
+                    st.rerun()
+
+            st.write("---")
+            st.write("إدارة الأقسام")
+            if st.button("تعديل الأقسام", key=f"edit_dept_{college.name}"):
+                new_departments = show_department_dialog(
+                    college.name,
+                    college.departments
+                )
+                if new_departments:
+                    success = st.session_state.college_manager.update_college(
+                        college.name,
+                        college.name,
+                        college.students_count,
+                        college.foreign_students,
+                        college.graduate_students,
+                        college.dorm_students,
+                        college.evening_students,
+                        college.evening_hosted_students,
+                        new_departments,
+                        expected_version=college.version
+                    )
+                    if success:
+                        st.success("تم تحديث الأقسام بنجاح")
+                        time.sleep(0.3)
+                        st.rerun()
+
+
+def show_file_jobs(college_name):
+    """عرض تقدم مهام المعالجة الخلفية لملفات الكلية"""
+    jobs = st.session_state.file_manager.get_jobs(college_name, active_only=True)
+    if not jobs:
+        return
+    st.write("جاري معالجة الملفات:")
+    for job in jobs:
+        st.progress(job['progress'], text=f"{job['filename']} ({job['kind']})")
+
+
+def perf_panel_enabled():
+    """صفحة الأداء اختيارية: تُفعّل بالمتغير PERF_PANEL=1 وتظهر للمدير فقط"""
+    return os.environ.get('PERF_PANEL') == '1' and st.session_state.get('username') == 'admin'
+
+
+def show_performance_panel():
+    st.header("أداء النظام")
+    metrics = perf_metrics.snapshot()
+    if not metrics:
+        st.info("لا توجد قياسات بعد")
+        return
+
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 2)
+
+    perf_df = pd.DataFrame([
+        {
+            "العملية": name,
+            "عدد الاستدعاءات": stats['count'],
+            "المتوسط (ms)": ms(stats['mean_seconds']),
+            "p50 (ms)": ms(stats['p50']),
+            "p95 (ms)": ms(stats['p95']),
+            "p99 (ms)": ms(stats['p99']),
+            "الإجمالي (s)": round(stats['total_seconds'], 3),
+        }
+        for name, stats in metrics.items()
+    ]).sort_values("الإجمالي (s)", ascending=False)
+    st.dataframe(perf_df, hide_index=True, use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "تحميل JSON", perf_metrics.to_json(metrics), file_name="metrics.json",
+            mime="application/json"
+        )
+    with col2:
+        st.download_button(
+            "تحميل Prometheus", perf_metrics.to_prometheus(metrics), file_name="metrics.prom",
+            mime="text/plain"
+        )
+    with col3:
+        if st.button("تصفير القياسات"):
+            perf_metrics.reset()
+            st.rerun()
+
 
 def main():
     if not st.session_state.authenticated:
@@ -135,6 +298,7 @@ def main():
                         time.sleep(0.5)
                         if check_login(username, password):
                             st.session_state.authenticated = True
+                            st.session_state.username = username
                             st.success("تم تسجيل الدخول بنجاح!")
                             time.sleep(0.5)
                             st.rerun()
@@ -143,15 +307,15 @@ def main():
         return
 
     # Main application interface
-    with st.spinner("جاري تحميل النظام..."):
-        st.title("نظام إدارة كليات جامعة واسط")
+    st.title("نظام إدارة كليات جامعة واسط")
 
-        menu = st.sidebar.selectbox(
-            "القائمة الرئيسية",
-            ["الرئيسية", "إدارة الكليات", "إدارة الملفات", "الإحصائيات"],
-            key="menu_select"
-        )
+    pages = ["الرئيسية", "إدارة الكليات", "إدارة الملفات", "الإحصائيات"]
+    if perf_panel_enabled():
+        pages.append("الأداء")
+    menu = st.sidebar.selectbox("القائمة الرئيسية", pages, key="menu_select")
 
+    # زمن تنفيذ كل صفحة يُسجل باسمها في مقاييس الأداء
+    with st.spinner("جاري تحميل النظام..."), timed(f"page.{menu}"):
         if menu == "الرئيسية":
             st.header("الصفحة الرئيسية")
             st.write("مرحباً بكم في نظام إدارة كليات جامعة واسط")
@@ -166,89 +330,37 @@ def main():
         elif menu == "إدارة الكليات":
             st.header("إدارة الكليات")
 
-            tab1, tab2 = st.tabs(["عرض الكليات", "إضافة كلية جديدة"])
+            tab1, tab2, tab3 = st.tabs(["عرض الكليات", "إضافة كلية جديدة", "استيراد من ملف"])
 
             with tab1:
-                colleges = st.session_state.college_manager.get_colleges()
-                if not colleges:
-                    st.info("لا توجد كليات مضافة حالياً")
+                college_query = st.text_input("بحث باسم الكلية", key="college_query")
+                colleges, total_colleges = st.session_state.college_manager.list_colleges(
+                    college_query, limit=0
+                )
+                if not total_colleges:
+                    st.info("لا توجد كليات مضافة حالياً" if not college_query else "لا توجد نتائج")
                 else:
+                    page_count = max(1, -(-total_colleges // COLLEGES_PER_PAGE))
+                    page = st.number_input(
+                        f"الصفحة (من {page_count})", min_value=1, max_value=page_count, value=1,
+                        key=f"college_page_{college_query}"
+                    ) if page_count > 1 else 1
+                    colleges, _ = st.session_state.college_manager.list_colleges(
+                        college_query, offset=(page - 1) * COLLEGES_PER_PAGE, limit=COLLEGES_PER_PAGE
+                    )
+                    st.caption(f"عدد الكليات: {total_colleges}")
                     for college in colleges:
-                        with st.container():
-                            col1, col2 = st.columns([3, 1])
-                            with col1:
-                                st.markdown(f"""
-                                    <div class='college-card'>
-                                        <h3>{college['name']} 🏛️</h3>
-                                        <div class='student-stats'>
-                                            <div class='stat-card'>
-                                                <h4>إجمالي الطلاب</h4>
-                                                <p>👥 {college['students_count']}</p>
-                                            </div>
-                                            <div class='stat-card'>
-                                                <h4>الطلاب الأجانب</h4>
-                                                <p>🌍 {college.get('foreign_students', 0)}</p>
-                                            </div>
-                                            <div class='stat-card'>
-                                                <h4>طلاب الدراسات العليا</h4>
-                                                <p>📚 {college.get('graduate_students', 0)}</p>
-                                            </div>
-                                            <div class='stat-card'>
-                                                <h4>طلاب الأقسام الداخلية</h4>
-                                                <p>🏠 {college.get('dorm_students', 0)}</p>
-                                            </div>
-                                            <div class='stat-card'>
-                                                <h4>طلاب المسائي</h4>
-                                                <p>🌙 {college.get('evening_students', 0)}</p>
-                                            </div>
-                                            <div class='stat-card'>
-                                                <h4>طلاب المسائي المستضافين</h4>
-                                                <p>📝 {college.get('evening_hosted_students', 0)}</p>
-                                            </div>
-                                        </div>
-                                        <div class='departments-section'>
-                                            <h4>الأقسام 📚</h4>
-                                            <ul>
-                                                {" ".join([f"<li>{dept}</li>" for dept in college.get('departments', [])])}
-                                            </ul>
-                                        </div>
-                                    </div>
-                                """, unsafe_allow_html=True)
-                            with col2:
-                                if st.button("تعديل", key=f"edit_{college['name']}"):
-                                    st.session_state.editing_college = college
-                                    st.rerun()
-                                if st.button(f"حذف", key=f"del_{college['name']}"):
-                                    with st.spinner("جاري الحذف..."):
-                                        st.session_state.college_manager.delete_college(college['name'])
-                                        time.sleep(0.3)
-                                        st.success("تم حذف الكلية بنجاح")
-                                        time.sleep(0.3)
-                                        st.rerun()
-
-                                st.write("---")
-                                st.write("إدارة الأقسام")
-                                if st.button("تعديل الأقسام", key=f"edit_dept_{college['name']}"):
-                                    new_departments = show_department_dialog(
-                                        college['name'],
-                                        college.get('departments', [])
-                                    )
-                                    if new_departments:
-                                        success = st.session_state.college_manager.update_college(
-                                            college['name'],
-                                            college['name'],
-                                            college['students_count'],
-                                            college.get('foreign_students', 0),
-                                            college.get('graduate_students', 0),
-                                            college.get('dorm_students', 0),
-                                            college.get('evening_students', 0),
-                                            college.get('evening_hosted_students', 0),
-                                            new_departments
-                                        )
-                                        if success:
-                                            st.success("تم تحديث الأقسام بنجاح")
-                                            time.sleep(0.3)
-                                            st.rerun()
+                        # البطاقة مطوية: سطر ملخص، والتفاصيل والأزرار لا تُرسل إلا عند فتحها
+                        col1, col2 = st.columns([4, 1])
+                        with col1:
+                            st.markdown(
+                                f"**{college.name}** 🏛️ — 👥 {college.students_count} طالب"
+                                f" · 📚 {len(college.departments)} قسم"
+                            )
+                        with col2:
+                            expanded = st.toggle("التفاصيل", key=f"college_expand_{college.name}")
+                        if expanded:
+                            show_college_details(college)
 
             with tab2:
                 with st.form("add_college_form"):
@@ -279,70 +391,188 @@ def main():
                             time.sleep(0.3)
                             st.rerun()
 
+            with tab3:
+                st.info(
+                    "يجب أن يحتوي الملف على عمود (الكلية)، ويمكن أن يحتوي على أعمدة الإحصائيات "
+                    "مثل (إجمالي الطلاب) وعمود (القسم). يمكن تكرار الكلية في عدة صفوف لإضافة "
+                    "أقسامها، والكليات الموجودة مسبقاً تُحدَّث بدلاً من تكرارها."
+                )
+                import_file = st.file_uploader("رفع ملف البيانات", type=['xlsx', 'csv'])
+                if import_file is not None:
+                    try:
+                        records, import_errors = parse_import_frame(read_import_file(import_file))
+                    except Exception as e:
+                        st.error(f"خطأ في قراءة الملف: {str(e)}")
+                        records, import_errors = [], []
+
+                    if import_errors:
+                        st.warning(f"تم تجاهل {len(import_errors)} صف بسبب أخطاء")
+                        st.dataframe(
+                            pd.DataFrame(import_errors, columns=["الصف", "الخطأ"]),
+                            hide_index=True
+                        )
+                    if records:
+                        st.write(f"عدد الكليات الجاهزة للاستيراد: {len(records)}")
+                        if st.button("استيراد البيانات"):
+                            with st.spinner("جاري استيراد البيانات..."):
+                                if st.session_state.college_manager.bulk_upsert(records):
+                                    st.success("تم استيراد البيانات بنجاح")
+                                    time.sleep(0.3)
+                                    st.rerun()
+
         elif menu == "إدارة الملفات":
             st.header("إدارة الملفات")
 
-            college_names = [c['name'] for c in st.session_state.college_manager.get_colleges()]
+            content_query = st.text_input("بحث في محتوى الملفات (كل الكليات)", key="content_query")
+            if content_query:
+                results = st.session_state.file_manager.search_files(content_query)
+                if results:
+                    for result in results:
+                        st.write(f"📄 {result['filename']} — {result['college']}")
+                        if result['snippet']:
+                            st.caption(result['snippet'])
+                else:
+                    st.info("لا توجد نتائج")
+
+            college_names = [c.name for c in st.session_state.college_manager.get_colleges()]
             if not college_names:
                 st.warning("الرجاء إضافة كلية أولاً")
             else:
                 selected_college = st.selectbox("اختر الكلية", college_names)
 
                 with st.container():
-                    uploaded_file = st.file_uploader("رفع ملف", type=['pdf', 'docx', 'txt'])
-                    if uploaded_file is not None:
-                        with st.spinner("جاري رفع الملف..."):
-                            st.session_state.file_manager.save_file(uploaded_file, selected_college)
-                            time.sleep(0.3)
-                            st.success("تم رفع الملف بنجاح")
+                    uploaded_files = st.file_uploader(
+                        "رفع ملفات", type=['pdf', 'docx', 'txt'], accept_multiple_files=True
+                    )
+                    # الملفات تبقى في أداة الرفع بين إعادات التشغيل، فيُحفظ الجديد منها فقط
+                    saved_uploads = st.session_state.setdefault('saved_uploads', set())
+                    new_files = [
+                        f for f in uploaded_files or []
+                        if (selected_college, f.file_id) not in saved_uploads
+                    ]
+                    if new_files:
+                        progress_bar = st.progress(0.0, text="جاري رفع الملفات...")
+                        results = st.session_state.file_manager.save_files(
+                            new_files, selected_college,
+                            uploader=st.session_state.get('username'),
+                            on_progress=lambda done, total, name, error: progress_bar.progress(
+                                done / total, text=f"{done}/{total}: {name}"
+                            )
+                        )
+                        saved_uploads.update((selected_college, f.file_id) for f in new_files)
+                        failed = [(name, error) for name, _, error in results if error]
+                        if len(failed) < len(results):
+                            st.success(f"تم رفع {len(results) - len(failed)} ملف بنجاح")
+                        if failed:
+                            st.error(f"تعذر رفع {len(failed)} ملف")
+                            st.dataframe(
+                                pd.DataFrame(failed, columns=["الملف", "الخطأ"]), hide_index=True
+                            )
+
+                # تحديث لوحة المهام كل ثانيتين ما دامت هناك مهام غير منتهية
+                active_jobs = st.session_state.file_manager.get_jobs(selected_college, active_only=True)
+                st.fragment(show_file_jobs, run_every=2 if active_jobs else None)(selected_college)
+
+                sort_options = {
+                    "الاسم": ('name', False),
+                    "الأحدث رفعاً": ('uploaded_at', True),
+                    "الأحدث تعديلاً": ('mtime', True),
+                    "الأكبر حجماً": ('size', True),
+                }
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    file_query = st.text_input("بحث باسم الملف", key="file_query")
+                with col2:
+                    sort_label = st.selectbox("الترتيب", list(sort_options), key="file_sort")
+                sort_by, descending = sort_options[sort_label]
 
-                files = st.session_state.file_manager.get_files(selected_college)
+                _, total_files = st.session_state.file_manager.list_files(
+                    selected_college, query=file_query, limit=0
+                )
+                page_count = max(1, -(-total_files // FILES_PER_PAGE))
+                page = st.number_input(
+                    f"الصفحة (من {page_count})", min_value=1, max_value=page_count, value=1,
+                    key=f"file_page_{selected_college}"
+                ) if page_count > 1 else 1
+                files, _ = st.session_state.file_manager.list_files(
+                    selected_college, query=file_query, sort_by=sort_by, descending=descending,
+                    offset=(page - 1) * FILES_PER_PAGE, limit=FILES_PER_PAGE
+                )
                 if files:
-                    st.write("الملفات المتوفرة:")
-                    for file in files:
-                        col1, col2 = st.columns([3, 1])
+                    st.write(f"الملفات المتوفرة: {total_files}")
+                    with st.expander("تصدير الملفات (ZIP)"):
+                        export_selection = st.multiselect(
+                            "اختر ملفات للتصدير (اتركها فارغة لتصدير كل ملفات الكلية)",
+                            [info['name'] for info in files],
+                            key=f"export_selection_{selected_college}"
+                        )
+                        if st.button("تصدير", key=f"export_{selected_college}"):
+                            st.session_state.file_manager.archive_link(
+                                selected_college, export_selection or None
+                            )
+                    for info in files:
+                        file = info['name']
+                        col1, col2, col3 = st.columns([3, 1, 1])
                         with col1:
+                            uploaded = time.strftime('%Y-%m-%d %H:%M', time.localtime(info['uploaded_at']))
                             st.write(f"📄 {file}")
+                            st.caption(
+                                f"{format_size(info['size'])} · {uploaded}"
+                                + (f" · مضغوط {format_size(info['stored_size'])}" if info.get('codec') else "")
+                                + (f" · {info['uploader']}" if info.get('uploader') else "")
+                            )
                         with col2:
                             if st.button("تحميل", key=f"download_{file}"):
                                 with st.spinner("جاري تحضير الملف للتحميل..."):
                                     st.session_state.file_manager.download_file(file, selected_college)
+                        with col3:
+                            if st.button("حذف", key=f"delete_file_{file}"):
+                                if st.session_state.file_manager.delete_file(file, selected_college):
+                                    st.success("تم حذف الملف بنجاح")
+                                    st.rerun()
 
         elif menu == "الإحصائيات":
             st.header("إحصائيات الكليات")
             with st.spinner("جاري تحميل الإحصائيات..."):
-                colleges = st.session_state.college_manager.get_colleges()
+                college_manager = st.session_state.college_manager
+                cache_key = college_manager.cache_key()
+                stats_df = cached_stats_dataframe(cache_key, college_manager)
+                # المجاميع المحفوظة مع البيانات وتُحدَّث مع كل تعديل
+                university_totals = college_manager.get_totals()['university']
 
                 # إحصائيات عامة
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    total_students = sum(c['students_count'] for c in colleges)
+                    total_students = university_totals['students_count']
                     st.metric("إجمالي عدد الطلاب", total_students, "👥")
                 with col2:
-                    total_foreign = sum(c.get('foreign_students', 0) for c in colleges)
+                    total_foreign = university_totals['foreign_students']
                     st.metric("إجمالي الطلاب الأجانب", total_foreign, "🌍")
                 with col3:
-                    total_graduate = sum(c.get('graduate_students', 0) for c in colleges)
+                    total_graduate = university_totals['graduate_students']
                     st.metric("إجمالي طلاب الدراسات العليا", total_graduate, "📚")
 
                 col4, col5, col6 = st.columns(3)
                 with col4:
-                    total_dorm = sum(c.get('dorm_students', 0) for c in colleges)
+                    total_dorm = university_totals['dorm_students']
                     st.metric("إجمالي طلاب الأقسام الداخلية", total_dorm, "🏠")
                 with col5:
-                    total_evening = sum(c.get('evening_students', 0) for c in colleges)
+                    total_evening = university_totals['evening_students']
                     st.metric("إجمالي طلاب المسائي", total_evening, "🌙")
                 with col6:
-                    total_hosted = sum(c.get('evening_hosted_students', 0) for c in colleges)
+                    total_hosted = university_totals['evening_hosted_students']
                     st.metric("إجمالي طلاب المسائي المستضافين", total_hosted, "📝")
 
                 # تصدير الإحصائيات العامة
                 st.markdown("### تصدير الإحصائيات العامة")
-                stats_df = create_stats_dataframe(colleges)
+                college_names = list(dict.fromkeys(stats_df[NAME_LABEL]))
 
                 col1, col2 = st.columns(2)
                 with col1:
-                    st.markdown(export_stats_to_excel(stats_df, "احصائيات_الكليات.xlsx"), unsafe_allow_html=True)
+                    excel_report_button(
+                        "colleges", cache_key, lambda: export_frame(stats_df),
+                        "احصائيات_الكليات.xlsx"
+                    )
                 with col2:
                     if st.button("تحضير للطباعة"):
                         st.markdown("""
@@ -363,30 +593,22 @@ def main():
                 # إحصائيات حسب الأقسام
                 st.subheader("إحصائيات الأقسام")
 
-                college_filter = st.selectbox(
-                    "اختر الكلية لعرض إحصائيات أقسامها",
-                    ["جميع الكليات"] + [c['name'] for c in colleges]
+                college_filter = st.multiselect(
+                    "اختر الكليات لعرض إحصائيات أقسامها (اتركها فارغة لجميع الكليات)",
+                    college_names
                 )
 
-                college_name = None if college_filter == "جميع الكليات" else college_filter
-                dept_stats = st.session_state.college_manager.get_department_stats(college_name)
-
-                if dept_stats:
-                    stats_df = pd.DataFrame(dept_stats).T
-                    stats_df.columns = [
-                        "إجمالي الطلاب",
-                        "الطلاب الأجانب",
-                        "طلاب الدراسات العليا",
-                        "طلاب الأقسام الداخلية",
-                        "طلاب المسائي",
-                        "طلاب المسائي المستضافين"
-                    ]
+                stats_df = cached_department_stats(cache_key, tuple(college_filter), college_manager)
 
+                if not stats_df.empty:
                     st.markdown("### جدول إحصائيات الأقسام")
                     st.dataframe(stats_df.round(2))
 
                     # تصدير إحصائيات الأقسام
-                    st.markdown(export_stats_to_excel(stats_df, "احصائيات_الاقسام.xlsx"), unsafe_allow_html=True)
+                    excel_report_button(
+                        "departments", (cache_key, tuple(college_filter)), lambda: stats_df,
+                        "احصائيات_الاقسام.xlsx"
+                    )
 
                     # رسوم بيانية للمقارنة
                     st.markdown("### مقارنة الأقسام")
@@ -401,6 +623,30 @@ def main():
                 else:
                     st.info("لا توجد أقسام مضافة حالياً")
 
+                # مساحة تخزين الملفات لكل كلية من العدادات المحفوظة
+                st.subheader("مساحة تخزين الملفات")
+                file_manager = st.session_state.file_manager
+                usage = file_manager.get_usage()
+                if usage:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("إجمالي الملفات", sum(u['files'] for u in usage.values()), "📁")
+                    with col2:
+                        st.metric("إجمالي المساحة", format_size(sum(u['bytes'] for u in usage.values())), "💾")
+                    usage_df = pd.DataFrame([
+                        {
+                            "الكلية": college_name,
+                            "عدد الملفات": u['files'],
+                            "المساحة": format_size(u['bytes']),
+                            **({"من الحصة (%)": round(100 * u['bytes'] / file_manager.quota_bytes, 1)}
+                               if file_manager.quota_bytes else {}),
+                        }
+                        for college_name, u in sorted(usage.items(), key=lambda item: -item[1]['bytes'])
+                    ])
+                    st.dataframe(usage_df, hide_index=True)
+                else:
+                    st.info("لا توجد ملفات مرفوعة حالياً")
+
                 # Animated charts 
                 st.subheader("توزيع الطلاب حسب الكليات")
                 with st.container():
@@ -416,23 +662,17 @@ def main():
                     """, unsafe_allow_html=True)
 
                     st.markdown("<div class='chart-container'>", unsafe_allow_html=True)
-                    chart_data = {
-                        "إجمالي الطلاب": [c['students_count'] for c in colleges],
-                        "الطلاب الأجانب": [c.get('foreign_students', 0) for c in colleges],
-                        "طلاب الدراسات العليا": [c.get('graduate_students', 0) for c in colleges],
-                        "طلاب الأقسام الداخلية": [c.get('dorm_students', 0) for c in colleges],
-                        "طلاب المسائي": [c.get('evening_students', 0) for c in colleges],
-                        "طلاب المسائي المستضافين": [c.get('evening_hosted_students', 0) for c in colleges]
-                    }
-
-                    for category, values in chart_data.items():
-                        st.bar_chart(
-                            data={c['name']: v for c, v in zip(colleges, values)},
-                            use_container_width=True
-                        )
-                        st.markdown("<br>", unsafe_allow_html=True)
+                    # رسم واحد بسلسلة لكل معيار بدلاً من رسم مستقل لكل معيار
+                    st.bar_chart(
+                        cached_chart_data(cache_key, college_manager),
+                        stack=False,
+                        use_container_width=True
+                    )
                     st.markdown("</div>", unsafe_allow_html=True)
 
+        elif menu == "الأداء":
+            show_performance_panel()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+مقارنة استهلاك الذاكرة وزمن التجميع بين تمثيلات الكليات الثلاثة:
+قواميس عادية (الصيغة السابقة)، سجلات College، وجدول CollegeTable العمودي.
+أسماء الكليات تُحتسب مرة واحدة ضمن القواميس لأن السجلات تشاركها (interned)،
+بينما تُدمج أسماء الأقسام المكررة في نسخة واحدة لكل اسم.
+
+الاستخدام:
+    python benchmarks/college_memory.py --colleges 100000 --departments 8
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from college_records import COLLEGE_FIELDS, College, CollegeTable
+from college_stats import department_stats
+
+DEPARTMENT_NAMES = [
+    "قسم علوم الحاسوب", "قسم الرياضيات", "قسم الفيزياء", "قسم الكيمياء",
+    "قسم علوم الحياة", "قسم اللغة العربية", "قسم اللغة الإنجليزية", "قسم التاريخ",
+    "قسم الجغرافية", "قسم القانون", "قسم المحاسبة", "قسم إدارة الأعمال",
+]
+
+
+def college_dicts(count, departments, seed=0):
+    """قواميس بصيغة ملف JSON، كما تُقرأ من القرص (كل قيمة نصية كائن مستقل)"""
+    rng = random.Random(seed)
+    data = [
+        {
+            "name": f"كلية رقم {i}",
+            **{field: rng.randint(0, 5000) for field in COLLEGE_FIELDS},
+            "departments": rng.sample(DEPARTMENT_NAMES, departments),
+            "version": i,
+        }
+        for i in range(count)
+    ]
+    return json.loads(json.dumps(data, ensure_ascii=False))
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def dict_totals(colleges):
+    return {field: sum(c.get(field, 0) for c in colleges) for field in COLLEGE_FIELDS}
+
+
+def record_totals(colleges):
+    return {field: sum(getattr(c, field) for c in colleges) for field in COLLEGE_FIELDS}
+
+
+def run(count, departments):
+    dicts, dicts_bytes, _ = measure(lambda: college_dicts(count, departments))
+    records, records_bytes, records_build = measure(
+        lambda: [College.from_dict(c) for c in dicts]
+    )
+    table, table_bytes, table_build = measure(lambda: CollegeTable.from_colleges(records))
+
+    return {
+        "colleges": count,
+        "departments_per_college": departments,
+        "bytes_per_college": {
+            "dict": round(dicts_bytes / count, 1),
+            "College": round(records_bytes / count, 1),
+            "CollegeTable": round(table_bytes / count, 1),
+        },
+        "build_seconds": {
+            "College": round(records_build, 4),
+            "CollegeTable": round(table_build, 4),
+        },
+        "totals_seconds": {
+            "dict": round(timed(lambda: dict_totals(dicts)), 4),
+            "College": round(timed(lambda: record_totals(records)), 4),
+            "CollegeTable": round(timed(table.totals), 4),
+        },
+        "department_stats_seconds": round(timed(lambda: department_stats(table)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--colleges', type=int, default=100000)
+    parser.add_argument('--departments', type=int, default=8)
+    args = parser.parse_args()
+    print(json.dumps(run(args.colleges, args.departments), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+قياس معدل الكتابة مع عدة عمليات كاتبة متزامنة على نفس بيانات الكليات.
+
+كل عملية تضيف كليات ثم تعدّلها، وفي النهاية يُتحقق من عدم ضياع أي تعديل
+(عدد الكليات ورقم إصدار البيانات يطابقان عدد العمليات المنفذة).
+
+الاستخدام:
+    python benchmarks/concurrent_writes.py --writers 16 --ops 200 --backend json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from college_records import College
+from college_store import JsonCollegeStore, SqliteCollegeStore
+
+
+def open_store(backend, directory):
+    if backend == 'sqlite':
+        return SqliteCollegeStore(os.path.join(directory, 'colleges.db'))
+    return JsonCollegeStore(os.path.join(directory, 'colleges.json'))
+
+
+def writer(backend, directory, writer_id, ops, start_event):
+    store = open_store(backend, directory)
+    start_event.wait()
+    for i in range(ops // 2):
+        name = f"كلية {writer_id}-{i}"
+        store.add_college(College(name, students_count=i, departments=(f"قسم {i}",)))
+        version = store.load()['index'][name].version
+        store.update_college(
+            name, {"name": name, "students_count": i + 1}, expected_version=version
+        )
+
+
+def run(backend, writers, ops):
+    directory = tempfile.mkdtemp(prefix='college-bench-')
+    open_store(backend, directory)
+    start_event = multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(
+            target=writer, args=(backend, directory, writer_id, ops, start_event)
+        )
+        for writer_id in range(writers)
+    ]
+    for process in processes:
+        process.start()
+    started = time.perf_counter()
+    start_event.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    store = open_store(backend, directory)
+    entry = store.load()
+    total_ops = writers * (ops // 2) * 2
+    return {
+        "backend": backend,
+        "writers": writers,
+        "operations": total_ops,
+        "seconds": round(elapsed, 4),
+        "ops_per_second": round(total_ops / elapsed, 1),
+        "colleges": len(entry['colleges']),
+        "data_version": entry['version'],
+        "lost_updates": total_ops - entry['version'],
+        "failed_writers": sum(1 for p in processes if p.exitcode != 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200, help="عدد العمليات لكل كاتب")
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'all'], default='all')
+    args = parser.parse_args()
+    backends = ['json', 'sqlite'] if args.backend == 'all' else [args.backend]
+    results = [run(backend, args.writers, args.ops) for backend in backends]
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
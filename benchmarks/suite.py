@@ -0,0 +1,209 @@
+"""
+مجموعة قياس أداء لعمليات CollegeManager و FileManager على بيانات مُولّدة.
+
+تُنشأ بيانات اصطناعية (كليات بأسماء وأقسام عربية، وملفات مرفوعة بأحجام مختلفة)
+داخل مجلد مؤقت، ويُقاس لكل عملية متوسط الزمن والإنتاجية وذروة الذاكرة
+(tracemalloc)، وتُطبع النتائج بصيغة JSON لمقارنتها بين الإصدارات.
+
+الاستخدام:
+    python benchmarks/suite.py
+    python benchmarks/suite.py --colleges 10 1000 --uploads 1KB 1MB --output results.json
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SUBJECTS = [
+    "الهندسة", "الطب", "طب الأسنان", "الصيدلة", "العلوم", "التربية", "الآداب",
+    "القانون", "الإدارة والاقتصاد", "الزراعة", "علوم الحاسوب والرياضيات",
+    "التربية البدنية وعلوم الرياضة", "العلوم الإسلامية", "الفنون الجميلة",
+]
+DEPARTMENTS = [
+    "قسم الهندسة المدنية", "قسم الهندسة الكهربائية", "قسم الهندسة الميكانيكية",
+    "قسم الرياضيات", "قسم الفيزياء", "قسم الكيمياء", "قسم علوم الحياة",
+    "قسم اللغة العربية", "قسم اللغة الإنجليزية", "قسم التاريخ", "قسم الجغرافية",
+    "قسم علوم القرآن", "قسم المحاسبة", "قسم الاقتصاد", "قسم إدارة الأعمال",
+    "قسم علوم الحاسوب", "قسم نظم المعلومات", "قسم الإنتاج الحيواني",
+    "قسم العلوم التربوية والنفسية", "قسم الفقه وأصوله",
+]
+SIZES = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(text):
+    for suffix, factor in SIZES.items():
+        if text.upper().endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def synthetic_colleges(count, seed=0):
+    """سجلات كليات بصيغة bulk_upsert بأسماء وأقسام عربية واقعية"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        students = rng.randint(500, 15000)
+        records.append({
+            "name": f"كلية {SUBJECTS[i % len(SUBJECTS)]} {i // len(SUBJECTS) + 1}",
+            "students_count": students,
+            "foreign_students": rng.randint(0, students // 50),
+            "graduate_students": rng.randint(0, students // 10),
+            "dorm_students": rng.randint(0, students // 5),
+            "evening_students": rng.randint(0, students // 4),
+            "evening_hosted_students": rng.randint(0, students // 20),
+            "departments": rng.sample(DEPARTMENTS, rng.randint(3, 10)),
+        })
+    return records
+
+
+class SyntheticUpload(io.BytesIO):
+    """بديل لـ UploadedFile في Streamlit: BytesIO مع اسم الملف"""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def measure(func, repeat):
+    """متوسط الزمن على repeat تشغيلات، ثم تشغيل إضافي تحت tracemalloc لذروة الذاكرة"""
+    gc.collect()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - started) / repeat
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def result(operation, elapsed, peak, items=1, nbytes=None):
+    row = {
+        "operation": operation,
+        "seconds": round(elapsed, 6),
+        "ops_per_second": round(1 / elapsed, 2) if elapsed else None,
+        "items_per_second": round(items / elapsed, 1) if elapsed else None,
+        "peak_memory_bytes": peak,
+    }
+    if nbytes is not None:
+        row["mb_per_second"] = round(nbytes / elapsed / SIZES['MB'], 1) if elapsed else None
+    return row
+
+
+def bench_colleges(count, repeat):
+    from app import create_stats_dataframe
+    from college_aggregates import export_frame
+    from report_cache import write_excel
+    from college_manager import CollegeManager
+
+    manager = CollegeManager()
+    manager.bulk_upsert(synthetic_colleges(count))
+    rows = []
+
+    def run(operation, func, items=1, times=repeat):
+        elapsed, peak = measure(func, times)
+        rows.append(dict(result(operation, elapsed, peak, items), colleges=count))
+
+    colleges = manager.get_colleges()
+    target = colleges[len(colleges) // 2]
+    counter = iter(range(10 ** 9))
+
+    run("get_colleges", manager.get_colleges, count)
+    run("get_department_stats", manager.get_department_stats, count)
+    run("create_stats_dataframe", lambda: create_stats_dataframe(manager.get_colleges()), count)
+    stats_df = create_stats_dataframe(manager.get_colleges())
+    run(
+        "write_excel", lambda: write_excel('report.xlsx', export_frame(stats_df)), count,
+        times=1 if count > 10000 else repeat
+    )
+
+    run("add_college", lambda: manager.add_college(
+        f"كلية مضافة {next(counter)}", 1000, 10, 50, 100, 200, 20, ["قسم جديد"]
+    ))
+    run("update_college", lambda: manager.update_college(
+        target.name, target.name, next(counter), 1, 1, 1, 1, 1, list(target.departments)
+    ))
+    run("add_department", lambda: manager.add_department(target.name, f"قسم {next(counter)}"))
+    run("remove_department", lambda: manager.remove_department(target.name, DEPARTMENTS[0]))
+    run("delete_college", lambda: manager.delete_college(f"كلية مضافة {next(counter)}"))
+    batch = synthetic_colleges(min(count, 1000), seed=1)
+    run("bulk_upsert", lambda: manager.bulk_upsert(batch), len(batch))
+    return rows
+
+
+def bench_files(sizes, repeat):
+    from file_manager import FileManager
+
+    manager = FileManager()
+    college = "كلية الهندسة 1"
+    rows = []
+    for size in sizes:
+        times = repeat if size <= SIZES['MB'] else 1
+        # محتوى جديد لكل تشغيل (measure يشغل الدالة times + 1 مرة)، وإلا قاس
+        # كل تشغيل بعد الأول مسار المحتوى الموجود مسبقاً في مخزن المحتوى فقط
+        uploads = iter([
+            SyntheticUpload(f"وثيقة_{size}_{i}.pdf", os.urandom(size)) for i in range(times + 1)
+        ])
+
+        def save():
+            nonlocal upload
+            upload = next(uploads)
+            manager.save_file(upload, college)
+
+        upload = None
+        elapsed, peak = measure(save, times)
+        rows.append(dict(result("save_file", elapsed, peak, nbytes=size), bytes=size))
+        elapsed, peak = measure(lambda: manager.download_file(upload.name, college), times)
+        rows.append(dict(result("download_file", elapsed, peak, nbytes=size), bytes=size))
+
+    files = len(manager.get_files(college))
+    elapsed, peak = measure(lambda: manager.get_files(college), repeat)
+    rows.append(dict(result("get_files", elapsed, peak, files), files=files))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--colleges', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--uploads', nargs='+', default=['1KB', '1MB', '20MB', '200MB'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="ملف لحفظ النتائج بدلاً من الطباعة فقط")
+    args = parser.parse_args()
+
+    # رسائل Streamlit عن التشغيل خارج `streamlit run` لا تعني شيئاً هنا
+    os.environ.setdefault('STREAMLIT_LOGGER_LEVEL', 'error')
+    workdir = tempfile.mkdtemp(prefix='wasit-bench-')
+    previous_cwd = os.getcwd()
+    results = {"colleges": [], "files": []}
+    try:
+        for count in args.colleges:
+            # كل حجم بيانات في مجلد مستقل لأن المديرين يستخدمون مسارات data/ النسبية
+            os.chdir(tempfile.mkdtemp(dir=workdir))
+            results["colleges"].extend(bench_colleges(count, args.repeat))
+        os.chdir(tempfile.mkdtemp(dir=workdir))
+        results["files"] = bench_files([parse_size(s) for s in args.uploads], args.repeat)
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
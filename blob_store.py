@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import tempfile
+from college_store import FileLock, atomic_write_json
+
+# امتداد ملف المحتوى ودالة فتحه لكل طريقة ضغط مدعومة
+CODECS = {
+    'gzip': ('.gz', lambda path: gzip.open(path, 'rb')),
+    'lzma': ('.xz', lambda path: lzma.open(path, 'rb')),
+}
+# يُحفظ المحتوى مضغوطاً فقط إذا وفّر الضغط هذه النسبة من حجمه على الأقل
+MIN_SAVING = 0.05
+
+
+def codec_of(path):
+    """طريقة ضغط ملف المحتوى حسب امتداده، أو None إذا كان غير مضغوط"""
+    for codec, (suffix, _) in CODECS.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+
+def open_blob(path):
+    """فتح ملف المحتوى للقراءة مع فك الضغط أثناء القراءة إذا كان مضغوطاً"""
+    codec = codec_of(path)
+    if codec is None:
+        return open(path, 'rb')
+    return CODECS[codec][1](path)
+
+
+class BlobStore:
+    """
+    مخزن محتوى مُعنوَن ببصمة SHA-256: كل محتوى فريد يُخزن مرة واحدة في
+    blobs/<أول حرفين من البصمة>/<البصمة>، مع عدّاد مراجع لكل بصمة في
+    refs.json. يُحذف المحتوى عندما لا يعود أي ملف يشير إليه.
+
+    التعديلات على العدادات (والبيانات المرتبطة بها لدى المستدعي) تتم
+    داخل with store.lock() حتى لا تتداخل الجلسات والعمليات المختلفة.
+
+    يمكن حفظ المحتوى مضغوطاً (gzip أو lzma) باسم البصمة مع امتداد الضغط،
+    والبصمة دائماً بصمة المحتوى الأصلي. locate تجد الملف أياً كانت صيغته
+    و open_blob تقرؤه مع فك الضغط.
+    """
+
+    def __init__(self, root='data/blobs', chunk_size=1024 * 1024):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.tmp_path = os.path.join(root, 'tmp')
+        self.refs_path = os.path.join(root, 'refs.json')
+        self.lock_path = os.path.join(root, '.lock')
+        os.makedirs(self.tmp_path, exist_ok=True)
+
+    def lock(self):
+        return FileLock(self.lock_path)
+
+    def path(self, digest, codec=None):
+        path = os.path.join(self.root, digest[:2], digest)
+        return path + CODECS[codec][0] if codec else path
+
+    def locate(self, digest):
+        """مسار ملف المحتوى المخزن بأي صيغة، أو None إذا لم يكن موجوداً"""
+        for codec in (None, *CODECS):
+            path = self.path(digest, codec)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def stage(self, source, codec=None):
+        """
+        نسخ المحتوى من كائن ملف إلى ملف مؤقت على أجزاء مع حساب بصمته، ثم
+        ضغطه بـ codec إذا طُلب ولم يكن المحتوى مخزناً من قبل.
+        يُعيد (البصمة، الحجم الأصلي، مسار الملف المؤقت، الضغط المستخدم أو None)
+        لتمريرها إلى commit.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(prefix='upload-', suffix='.tmp', dir=self.tmp_path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        digest = digest.hexdigest()
+        if codec is None or self.locate(digest) is not None:
+            return digest, size, tmp_path, None
+        try:
+            compressed_path = self._compress(tmp_path, codec)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        if os.path.getsize(compressed_path) > size * (1 - MIN_SAVING):
+            os.remove(compressed_path)
+            return digest, size, tmp_path, None
+        os.remove(tmp_path)
+        return digest, size, compressed_path, codec
+
+    def _compress(self, tmp_path, codec):
+        fd, compressed_path = tempfile.mkstemp(
+            prefix='upload-', suffix=CODECS[codec][0], dir=self.tmp_path
+        )
+        os.close(fd)
+        try:
+            if codec == 'gzip':
+                target = gzip.open(compressed_path, 'wb', compresslevel=6)
+            else:
+                target = lzma.open(compressed_path, 'wb')
+            with open(tmp_path, 'rb') as source, target:
+                shutil.copyfileobj(source, target, self.chunk_size)
+            with open(compressed_path, 'rb+') as f:
+                os.fsync(f.fileno())
+        except BaseException:
+            os.remove(compressed_path)
+            raise
+        return compressed_path
+
+    def commit(self, digest, tmp_path, codec=None):
+        """نقل ملف مؤقت إلى مكانه في المخزن، أو حذفه إذا كان المحتوى موجوداً"""
+        if self.locate(digest) is not None:
+            os.remove(tmp_path)
+            return
+        blob_path = self.path(digest, codec)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(tmp_path, blob_path)
+
+    def discard(self, tmp_path):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    def read_refs(self):
+        try:
+            with open(self.refs_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def update_refs(self, added=(), removed=()):
+        """
+        زيادة عدادات البصمات في added وإنقاص التي في removed بكتابة واحدة،
+        ثم حذف المحتوى الذي أصبح عداده صفراً. يُستدعى داخل lock().
+        """
+        refs = self.read_refs()
+        for digest in added:
+            refs[digest] = refs.get(digest, 0) + 1
+        orphaned = []
+        for digest in removed:
+            count = refs.get(digest, 0) - 1
+            if count > 0:
+                refs[digest] = count
+            else:
+                refs.pop(digest, None)
+                orphaned.append(digest)
+        atomic_write_json(self.refs_path, refs)
+        for digest in orphaned:
+            blob_path = self.locate(digest)
+            if blob_path is not None:
+                os.remove(blob_path)
+
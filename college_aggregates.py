@@ -0,0 +1,41 @@
+"""
+تجميع إحصائيات الكليات للوحة الإحصائيات: جدول عمودي واحد يُبنى من
+CollegeTable مباشرة (الأعمدة الرقمية تُقرأ من مصفوفاتها دون المرور على
+الكليات واحدة واحدة)، وتُشتق منه جداول العرض والرسم والتصدير.
+"""
+import numpy as np
+import pandas as pd
+
+from college_records import COLLEGE_FIELDS
+
+NAME_LABEL = "الكلية"
+DEPARTMENTS_LABEL = "عدد الأقسام"
+# عنوان كل حقل رقمي في الجداول والرسوم، بترتيب COLLEGE_FIELDS
+FIELD_LABELS = dict(zip(COLLEGE_FIELDS, [
+    "إجمالي الطلاب",
+    "الطلاب الأجانب",
+    "طلاب الدراسات العليا",
+    "طلاب الأقسام الداخلية",
+    "طلاب المسائي",
+    "طلاب المسائي المستضافين",
+]))
+STUDENT_COLUMNS = list(FIELD_LABELS.values())
+
+
+def college_frame(table):
+    """جدول بصف لكل كلية: الاسم والحقول الرقمية وعدد الأقسام"""
+    data = {NAME_LABEL: np.asarray(table.names, dtype=object)}
+    for field, label in FIELD_LABELS.items():
+        data[label] = np.frombuffer(table.column(field), dtype=np.int64)
+    data[DEPARTMENTS_LABEL] = np.diff(np.frombuffer(table.department_offsets, dtype=np.int64))
+    return pd.DataFrame(data)
+
+
+def chart_frame(frame):
+    """بيانات رسم توزيع الطلاب: صف لكل كلية وعمود (سلسلة) لكل حقل"""
+    return frame.set_index(NAME_LABEL)[STUDENT_COLUMNS]
+
+
+def export_frame(frame):
+    """جدول تقرير الكليات بالاسم فهرساً"""
+    return frame.set_index(NAME_LABEL)
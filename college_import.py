@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+from college_records import COLLEGE_FIELDS, MAX_FIELD_VALUE
+
+# أسماء الأعمدة المقبولة في ملفات الاستيراد، بالعربية (كما في تقارير التصدير)
+# أو بأسماء الحقول الداخلية
+IMPORT_COLUMNS = {
+    "الكلية": "name",
+    "اسم الكلية": "name",
+    "name": "name",
+    "إجمالي الطلاب": "students_count",
+    "students_count": "students_count",
+    "الطلاب الأجانب": "foreign_students",
+    "foreign_students": "foreign_students",
+    "طلاب الدراسات العليا": "graduate_students",
+    "graduate_students": "graduate_students",
+    "طلاب الأقسام الداخلية": "dorm_students",
+    "dorm_students": "dorm_students",
+    "طلاب المسائي": "evening_students",
+    "evening_students": "evening_students",
+    "طلاب المسائي المستضافين": "evening_hosted_students",
+    "evening_hosted_students": "evening_hosted_students",
+    "القسم": "department",
+    "department": "department",
+}
+
+
+def read_import_file(uploaded_file):
+    """قراءة ملف xlsx أو csv إلى DataFrame بقيم نصية دون تحويل"""
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if extension == '.csv':
+        return pd.read_csv(uploaded_file, dtype=str, keep_default_na=False)
+    if extension in ('.xlsx', '.xls'):
+        return pd.read_excel(uploaded_file, dtype=str, keep_default_na=False)
+    raise ValueError(f"صيغة ملف غير مدعومة: {extension}")
+
+
+def parse_import_frame(df):
+    """
+    التحقق من جدول الاستيراد وتحويله إلى سجلات كليات.
+    كل صف يمثل كلية أو قسماً من أقسامها؛ الصفوف المتعددة لنفس الكلية تُدمج،
+    والخلايا الرقمية الفارغة تعني إبقاء القيمة الحالية دون تغيير.
+    تُعاد السجلات الصالحة وقائمة أخطاء بصيغة (رقم الصف في الملف، الرسالة).
+    """
+    df = df.rename(columns=lambda c: IMPORT_COLUMNS.get(str(c).strip(), str(c).strip()))
+    df = df.loc[:, ~df.columns.duplicated()]
+    if 'name' not in df.columns:
+        return [], [(1, "عمود اسم الكلية (الكلية) غير موجود")]
+
+    # رقم الصف كما يظهر في الملف: الصف الأول للعناوين
+    row_numbers = pd.Series(range(2, len(df) + 2), index=df.index)
+    names = df['name'].astype('string').fillna('').str.strip()
+    errors = pd.Series('', index=df.index, dtype=object)
+    errors[names == ''] = "اسم الكلية مفقود"
+
+    values = {}
+    for field in COLLEGE_FIELDS:
+        if field not in df.columns:
+            continue
+        raw = df[field].astype('string').fillna('').str.strip()
+        numbers = pd.to_numeric(raw, errors='coerce')
+        blank = raw == ''
+        invalid = (
+            (~blank & numbers.isna())
+            | (numbers < 0)
+            | (numbers.notna() & (numbers % 1 != 0))
+        )
+        errors[invalid & (errors == '')] = f"قيمة غير صالحة في العمود {field}"
+        too_large = numbers > MAX_FIELD_VALUE
+        errors[too_large & (errors == '')] = f"قيمة أكبر من الحد المسموح ({MAX_FIELD_VALUE}) في العمود {field}"
+        values[field] = numbers.where(~blank)
+
+    if 'department' in df.columns:
+        departments = df['department'].astype('string').fillna('').str.strip()
+    else:
+        departments = pd.Series('', index=df.index, dtype='string')
+
+    valid = errors == ''
+    table = pd.DataFrame({'name': names, 'department': departments, **values})[valid]
+
+    records = []
+    if not table.empty:
+        # first() يتجاهل القيم المفقودة فتُؤخذ أول قيمة مذكورة لكل كلية
+        fields = table.groupby('name', sort=False)[list(values)].first()
+        dept_lists = (
+            table[table['department'] != '']
+            .drop_duplicates(['name', 'department'])
+            .groupby('name', sort=False)['department']
+            .agg(list)
+            .to_dict()
+        )
+        for name, row in fields.to_dict('index').items():
+            record = {'name': name}
+            record.update(
+                (field, int(value)) for field, value in row.items() if pd.notna(value)
+            )
+            record['departments'] = dept_lists.get(name, [])
+            records.append(record)
+
+    row_errors = list(zip(row_numbers[~valid].tolist(), errors[~valid].tolist()))
+    return records, row_errors
@@ -1,31 +1,156 @@
-import json
 import os
 import streamlit as st
+from college_store import JsonCollegeStore, SqliteCollegeStore, StaleEditError, compute_totals
+from college_records import College, CollegeTable
+from college_stats import department_stats
+from perf_metrics import instrumented
 
+# دوال st.cache_data المشتقة من بيانات الكليات، تُمسح بعد كل تعديل من هذه
+# العملية. المفتاح (الوحدة، الاسم) لأن Streamlit يعيد تنفيذ app.py مع كل
+# تفاعل فيُعرّف الدوال من جديد؛ يبقى لكل دالة آخر تعريف لها فقط.
+_derived_caches = {}
+
+
+def derived_cache(func):
+    """
+    تسجيل دالة st.cache_data مشتقة من بيانات الكليات لتُمسح عند التعديل.
+    يجب أن تأخذ الدالة مفتاح CollegeManager.cache_key() معاملاً حتى تُحسب
+    من جديد بعد تعديلات العمليات الأخرى أيضاً.
+    """
+    _derived_caches[(func.__module__, func.__qualname__)] = func
+    return func
+
+
+def invalidate_derived_caches():
+    for func in _derived_caches.values():
+        func.clear()
+
+
+@instrumented('CollegeManager')
 class CollegeManager:
-    def __init__(self):
+    def __init__(self, backend=None):
+        # يُحدد نوع التخزين عبر المتغير البيئي COLLEGE_STORAGE_BACKEND (json أو sqlite)
+        self.backend = backend or os.environ.get('COLLEGE_STORAGE_BACKEND', 'json')
         self.file_path = 'data/colleges.json'
-        self._init_storage()
+        self.store = self._init_storage()
 
     def _init_storage(self):
-        if not os.path.exists('data'):
-            os.makedirs('data')
-        if not os.path.exists(self.file_path):
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump([], f)
+        if self.backend == 'sqlite':
+            store = SqliteCollegeStore('data/colleges.db')
+            store.migrate_from_json(self.file_path)
+            return store
+        if self.backend != 'json':
+            raise ValueError(f"نوع تخزين غير معروف: {self.backend}")
+        # COLLEGE_BINARY_SNAPSHOT=1 يفعّل اللقطة الثنائية لتسريع التحميل
+        binary_snapshot = os.environ.get('COLLEGE_BINARY_SNAPSHOT', '0') == '1'
+        return JsonCollegeStore(self.file_path, binary_snapshot=binary_snapshot)
 
     def get_colleges(self):
+        """
+        قائمة الكليات من الذاكرة المؤقتة المشتركة؛ يجب التعامل معها للقراءة فقط
+        """
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return self.store.load()['colleges']
         except Exception as e:
             st.error(f"خطأ في قراءة بيانات الكليات: {str(e)}")
             return []
 
+    def list_colleges(self, query='', offset=0, limit=None):
+        """
+        صفحة من الكليات التي يحتوي اسمها على query (دون تمييز حالة الأحرف)،
+        من offset بطول limit. يُعيد (كليات الصفحة، العدد الكلي بعد التصفية).
+        """
+        colleges = self.get_colleges()
+        if query:
+            needle = query.strip().casefold()
+            colleges = [c for c in colleges if needle in c.name.casefold()]
+        end = None if limit is None else offset + limit
+        return colleges[offset:end], len(colleges)
+
+    def get_table(self):
+        """
+        الكليات بصيغة CollegeTable العمودية، تُبنى مرة واحدة لكل إصدار من البيانات
+        """
+        try:
+            entry = self.store.load()
+        except Exception as e:
+            st.error(f"خطأ في قراءة بيانات الكليات: {str(e)}")
+            return CollegeTable.from_colleges([])
+        table = entry.get('table')
+        if table is None:
+            table = entry['table'] = CollegeTable.from_colleges(entry['colleges'])
+        return table
+
+    def get_data_version(self):
+        """رقم إصدار البيانات، يزداد مع كل تعديل من أي جلسة"""
+        try:
+            return self.store.data_version()
+        except Exception as e:
+            st.error(f"خطأ في قراءة بيانات الكليات: {str(e)}")
+            return 0
+
+    def cache_key(self):
+        """مفتاح للتخزين المؤقت للبيانات المشتقة: يتغير مع كل تعديل على الكليات"""
+        return (self.backend, self.file_path, self.get_data_version())
+
+    def get_totals(self):
+        """
+        مجاميع الإحصائيات المحفوظة مع البيانات: university للجامعة كاملة
+        و colleges لكل كلية، وتُحدَّث مع كل تعديل دون إعادة المرور على الكليات
+        """
+        try:
+            return self.store.load()['totals']
+        except Exception as e:
+            st.error(f"خطأ في قراءة بيانات الكليات: {str(e)}")
+            return compute_totals([])
+
+    def get_college(self, name):
+        try:
+            return self.store.load()['index'].get(name)
+        except Exception as e:
+            st.error(f"خطأ في قراءة بيانات الكليات: {str(e)}")
+            return None
+
     def add_college(self, name, students_count, foreign_students, graduate_students, 
                    dorm_students, evening_students, evening_hosted_students, departments=None):
-        colleges = self.get_colleges()
-        college = {
+        college = College(
+            name=name,
+            students_count=students_count,
+            foreign_students=foreign_students,
+            graduate_students=graduate_students,
+            dorm_students=dorm_students,
+            evening_students=evening_students,
+            evening_hosted_students=evening_hosted_students,
+            departments=tuple(departments or ()),
+        )
+        try:
+            self.store.add_college(college)
+            invalidate_derived_caches()
+        except Exception as e:
+            st.error(f"خطأ في حفظ بيانات الكلية: {str(e)}")
+
+    def bulk_upsert(self, records):
+        """
+        إضافة أو تحديث مجموعة كليات دفعة واحدة بكتابة واحدة.
+        كل سجل قاموس يحتوي على name وأي من الحقول الرقمية وقائمة departments
+        التي تُضاف إلى أقسام الكلية الحالية.
+        """
+        try:
+            self.store.bulk_upsert(records)
+            invalidate_derived_caches()
+            return True
+        except Exception as e:
+            st.error(f"خطأ في استيراد بيانات الكليات: {str(e)}")
+            return False
+
+    def update_college(self, old_name, name, students_count, foreign_students,
+                      graduate_students, dorm_students, evening_students, evening_hosted_students,
+                      departments=None, expected_version=None):
+        """
+        تحديث بيانات الكلية. عند تمرير expected_version (قيمة الحقل version
+        التي عُرضت للمستخدم) يُرفض التحديث إذا عدّل مستخدم آخر الكلية في الأثناء.
+        """
+        fields = {
             "name": name,
             "students_count": students_count,
             "foreign_students": foreign_students,
@@ -33,117 +158,49 @@ class CollegeManager:
             "dorm_students": dorm_students,
             "evening_students": evening_students,
             "evening_hosted_students": evening_hosted_students,
-            "departments": departments or []
         }
-        colleges.append(college)
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(colleges, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            st.error(f"خطأ في حفظ بيانات الكلية: {str(e)}")
-
-    def update_college(self, old_name, name, students_count, foreign_students, 
-                      graduate_students, dorm_students, evening_students, evening_hosted_students,
-                      departments=None):
-        colleges = self.get_colleges()
-        for college in colleges:
-            if college['name'] == old_name:
-                college.update({
-                    "name": name,
-                    "students_count": students_count,
-                    "foreign_students": foreign_students,
-                    "graduate_students": graduate_students,
-                    "dorm_students": dorm_students,
-                    "evening_students": evening_students,
-                    "evening_hosted_students": evening_hosted_students,
-                })
-                if departments is not None:
-                    college["departments"] = departments
-                break
-        try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(colleges, f, ensure_ascii=False, indent=2)
+            self.store.update_college(old_name, fields, departments, expected_version)
+            invalidate_derived_caches()
             return True
+        except StaleEditError:
+            st.error("تم تعديل بيانات الكلية من مستخدم آخر، يرجى تحديث الصفحة وإعادة المحاولة")
+            return False
         except Exception as e:
             st.error(f"خطأ في تحديث بيانات الكلية: {str(e)}")
             return False
 
-    def get_department_stats(self, college_name=None):
+    def get_department_stats(self, college_names=None):
         """
-        احصل على إحصائيات الطلاب مصنفة حسب الأقسام
+        احصل على إحصائيات الطلاب مصنفة حسب الأقسام، لكلية أو قائمة كليات أو للجميع
         """
-        colleges = self.get_colleges()
-        stats = {}
-
-        for college in colleges:
-            if college_name and college['name'] != college_name:
-                continue
-
-            for dept in college.get('departments', []):
-                if dept not in stats:
-                    stats[dept] = {
-                        'total_students': 0,
-                        'foreign_students': 0,
-                        'graduate_students': 0,
-                        'dorm_students': 0,
-                        'evening_students': 0,
-                        'evening_hosted_students': 0
-                    }
-
-                # احتساب نسبة الطلاب لكل قسم
-                dept_count = len(college.get('departments', []))
-                if dept_count > 0:
-                    students_per_dept = {
-                        'total_students': college['students_count'] / dept_count,
-                        'foreign_students': college.get('foreign_students', 0) / dept_count,
-                        'graduate_students': college.get('graduate_students', 0) / dept_count,
-                        'dorm_students': college.get('dorm_students', 0) / dept_count,
-                        'evening_students': college.get('evening_students', 0) / dept_count,
-                        'evening_hosted_students': college.get('evening_hosted_students', 0) / dept_count
-                    }
-
-                    for key in stats[dept]:
-                        stats[dept][key] += students_per_dept[key]
-
-        return stats
+        return self.get_department_stats_frame(college_names).to_dict('index')
+
+    def get_department_stats_frame(self, college_names=None):
+        """إحصائيات الأقسام كجدول بصف لكل قسم"""
+        return department_stats(self.get_table(), college_names)
 
     def add_department(self, college_name, department_name):
-        colleges = self.get_colleges()
-        for college in colleges:
-            if college['name'] == college_name:
-                if 'departments' not in college:
-                    college['departments'] = []
-                if department_name not in college['departments']:
-                    college['departments'].append(department_name)
-                break
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(colleges, f, ensure_ascii=False, indent=2)
+            self.store.add_department(college_name, department_name)
+            invalidate_derived_caches()
             return True
         except Exception as e:
             st.error(f"خطأ في إضافة القسم: {str(e)}")
             return False
 
     def remove_department(self, college_name, department_name):
-        colleges = self.get_colleges()
-        for college in colleges:
-            if college['name'] == college_name:
-                if 'departments' in college and department_name in college['departments']:
-                    college['departments'].remove(department_name)
-                break
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(colleges, f, ensure_ascii=False, indent=2)
+            self.store.remove_department(college_name, department_name)
+            invalidate_derived_caches()
             return True
         except Exception as e:
             st.error(f"خطأ في حذف القسم: {str(e)}")
             return False
 
     def delete_college(self, name):
-        colleges = self.get_colleges()
-        colleges = [c for c in colleges if c['name'] != name]
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(colleges, f, ensure_ascii=False, indent=2)
+            self.store.delete_college(name)
+            invalidate_derived_caches()
         except Exception as e:
             st.error(f"خطأ في حذف الكلية: {str(e)}")
\ No newline at end of file
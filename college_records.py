@@ -0,0 +1,179 @@
+import sys
+from array import array
+from dataclasses import asdict, dataclass, fields, replace
+
+# الحقول الرقمية لكل كلية بالترتيب المستخدم في التخزين والتقارير
+COLLEGE_FIELDS = [
+    "students_count",
+    "foreign_students",
+    "graduate_students",
+    "dorm_students",
+    "evening_students",
+    "evening_hosted_students",
+]
+# أكبر قيمة مقبولة لأي حقل رقمي، أقل بكثير من حد int64 في الجداول العمودية
+# وفي SQLite ومن حد الدقة الصحيحة للأعداد العشرية عند قراءة ملفات الاستيراد
+MAX_FIELD_VALUE = 10 ** 9
+# المفاتيح المقبولة في سجلات الإضافة أو التحديث دفعة واحدة (bulk_upsert)
+UPSERT_KEYS = frozenset(['name', 'departments', *COLLEGE_FIELDS])
+
+
+def field_value(field, value):
+    """القيمة بصيغة int بعد التحقق أنها عدد صحيح بين 0 و MAX_FIELD_VALUE"""
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"قيمة غير صالحة للحقل {field}: {value!r}")
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"قيمة غير صالحة للحقل {field}: {value!r}") from None
+    if not 0 <= number <= MAX_FIELD_VALUE:
+        raise ValueError(f"قيمة الحقل {field} خارج المدى المسموح (0 - {MAX_FIELD_VALUE}): {number}")
+    return number
+
+
+def clean_upsert_record(record):
+    """
+    التحقق من سجل bulk_upsert وإعادة نسخة نظيفة منه: المفاتيح المعروفة فقط،
+    والحقول الرقمية أعداد صحيحة في المدى المسموح، والأقسام نصوص دون تكرار
+    """
+    unknown = set(record) - UPSERT_KEYS
+    if unknown:
+        raise ValueError(f"حقول غير معروفة: {', '.join(sorted(map(str, unknown)))}")
+    name = record.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError("اسم الكلية مفقود")
+    cleaned = {'name': name}
+    for field in COLLEGE_FIELDS:
+        if field in record:
+            cleaned[field] = field_value(field, record[field])
+    departments = record.get('departments', [])
+    if isinstance(departments, str) or not all(isinstance(dept, str) for dept in departments):
+        raise ValueError(f"أسماء أقسام غير صالحة للكلية {name}")
+    cleaned['departments'] = list(dict.fromkeys(departments))
+    return cleaned
+
+
+@dataclass(slots=True)
+class College:
+    """
+    سجل كلية واحدة. الأقسام مخزنة كـ tuple غير قابلة للتعديل لأن السجلات
+    مشتركة بين الجلسات عبر الذاكرة المؤقتة؛ التعديل يكون بإنشاء نسخة عبر with_changes.
+    """
+    name: str
+    students_count: int = 0
+    foreign_students: int = 0
+    graduate_students: int = 0
+    dorm_students: int = 0
+    evening_students: int = 0
+    evening_hosted_students: int = 0
+    departments: tuple = ()
+    version: int = 0
+
+    @classmethod
+    def from_dict(cls, data, **overrides):
+        """إنشاء سجل من قاموس بصيغة ملف JSON؛ المفاتيح غير المعروفة تُتجاهل"""
+        values = {key: data[key] for key in _COLLEGE_KEYS if key in data}
+        values.update(overrides)
+        values['name'] = sys.intern(values['name'])
+        values['departments'] = tuple(
+            sys.intern(dept) for dept in values.get('departments', ())
+        )
+        return cls(**values)
+
+    def to_dict(self):
+        """القاموس المقابل بصيغة ملف JSON"""
+        data = asdict(self)
+        data['departments'] = list(self.departments)
+        return data
+
+    def with_changes(self, **changes):
+        if 'departments' in changes:
+            changes['departments'] = tuple(changes['departments'])
+        return replace(self, **changes)
+
+    def department_records(self):
+        return [Department(dept, self.name) for dept in self.departments]
+
+
+_COLLEGE_KEYS = [f.name for f in fields(College)]
+
+
+@dataclass(slots=True, frozen=True)
+class Department:
+    name: str
+    college_name: str
+
+
+class CollegeTable:
+    """
+    جدول عمودي للكليات: مصفوفة أعداد صحيحة لكل حقل رقمي، وأسماء مُدمجة
+    (interned)، والأقسام بصيغة مسطحة مع مواضع بداية أقسام كل كلية.
+    يُبنى مرة واحدة لكل إصدار من البيانات ويُستخدم لمسارات التجميع.
+    """
+
+    def __init__(self, names, columns, versions, department_offsets, department_names):
+        self.names = names
+        self.columns = columns
+        self.versions = versions
+        self.department_offsets = department_offsets
+        self.department_names = department_names
+
+    @classmethod
+    def from_colleges(cls, colleges):
+        names = []
+        columns = {name: array('q') for name in COLLEGE_FIELDS}
+        versions = array('q')
+        department_offsets = array('q', [0])
+        department_names = []
+        for college in colleges:
+            names.append(sys.intern(college.name))
+            for name, column in columns.items():
+                column.append(getattr(college, name))
+            versions.append(college.version)
+            department_names.extend(college.departments)
+            department_offsets.append(len(department_names))
+        return cls(names, columns, versions, department_offsets, department_names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        start, end = self.department_offsets[i], self.department_offsets[i + 1]
+        return College(
+            self.names[i],
+            *(self.columns[name][i] for name in COLLEGE_FIELDS),
+            departments=tuple(self.department_names[start:end]),
+            version=self.versions[i],
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def records(self):
+        """كل الكليات كقائمة سجلات College"""
+        offsets = self.department_offsets
+        departments = self.department_names
+        rows = zip(self.names, *(self.columns[name] for name in COLLEGE_FIELDS), self.versions)
+        return [
+            College(*row[:-1], tuple(departments[offsets[i]:offsets[i + 1]]), row[-1])
+            for i, row in enumerate(rows)
+        ]
+
+    def column(self, name):
+        return self.columns[name]
+
+    def department_counts(self):
+        offsets = self.department_offsets
+        return array('q', (offsets[i + 1] - offsets[i] for i in range(len(self))))
+
+    def departments(self):
+        offsets = self.department_offsets
+        for i, college_name in enumerate(self.names):
+            for dept in self.department_names[offsets[i]:offsets[i + 1]]:
+                yield Department(dept, college_name)
+
+    def totals(self):
+        totals = {name: sum(column) for name, column in self.columns.items()}
+        totals['colleges'] = len(self)
+        totals['departments'] = len(self.department_names)
+        return totals
@@ -0,0 +1,202 @@
+"""
+صيغة لقطة ثنائية لبيانات الكليات تُقرأ عبر mmap دون تحليل JSON.
+
+تخطيط الملف (كل الأعداد int64 بترتيب little-endian بعد الترويسة):
+- الترويسة: التوقيع، إصدار الصيغة، إصدار البيانات، عدد الكليات n،
+  عدد الأقسام m، عدد النصوص s
+- عمود لكل حقل رقمي من COLLEGE_FIELDS (n قيمة لكل عمود)، ثم عمود version
+- أرقام نصوص أسماء الكليات (n)
+- مواضع بداية أقسام كل كلية (n + 1)، ثم أرقام نصوص الأقسام (m)
+- مواضع النصوص (s + 1) ثم النصوص نفسها بترميز UTF-8
+
+النصوص المكررة (أسماء الأقسام خاصة) تُخزن مرة واحدة في جدول النصوص.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from college_records import COLLEGE_FIELDS, College, CollegeTable
+
+MAGIC = b'WUCB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHqIIII')
+
+
+class SnapshotFormatError(ValueError):
+    """ملف اللقطة الثنائية تالف أو بصيغة غير مدعومة"""
+
+
+def _int_array(values):
+    data = array('q', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data
+
+
+def write_snapshot(path, colleges, data_version=0):
+    """كتابة قائمة سجلات College في ملف لقطة ثنائية"""
+    strings = {}
+
+    def string_id(text):
+        return strings.setdefault(text, len(strings))
+
+    table = CollegeTable.from_colleges(colleges)
+    name_ids = [string_id(name) for name in table.names]
+    department_ids = [string_id(name) for name in table.department_names]
+    encoded = [text.encode('utf-8') for text in strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(
+            MAGIC, FORMAT_VERSION, 0, data_version,
+            len(table), len(table.department_names), len(strings), 0
+        ))
+        for field in COLLEGE_FIELDS:
+            f.write(_int_array(table.column(field)).tobytes())
+        f.write(_int_array(table.versions).tobytes())
+        f.write(_int_array(name_ids).tobytes())
+        f.write(_int_array(table.department_offsets).tobytes())
+        f.write(_int_array(department_ids).tobytes())
+        f.write(_int_array(string_offsets).tobytes())
+        f.write(b''.join(encoded))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class SnapshotReader:
+    """
+    قراءة لقطة ثنائية عبر mmap. الأعمدة الرقمية تُقرأ مباشرة من الذاكرة
+    المعينة، والنصوص لا تُفك إلا عند الحاجة إليها.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self._mmap.close()
+            raise
+        self._strings = {}
+
+    def _parse(self):
+        if sys.byteorder != 'little':
+            raise SnapshotFormatError("اللقطة الثنائية مدعومة على الأنظمة little-endian فقط")
+        if len(self._mmap) < HEADER.size:
+            raise SnapshotFormatError("ملف اللقطة الثنائية قصير")
+        (magic, format_version, _, self.data_version,
+         count, departments, strings, _) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise SnapshotFormatError("صيغة اللقطة الثنائية غير مدعومة")
+        self._count = count
+        view = memoryview(self._mmap)
+        position = HEADER.size
+
+        def section(length):
+            nonlocal position
+            end = position + 8 * length
+            if end > len(self._mmap):
+                raise SnapshotFormatError("ملف اللقطة الثنائية غير مكتمل")
+            data = view[position:end].cast('q')
+            position = end
+            return data
+
+        self._columns = {field: section(count) for field in COLLEGE_FIELDS}
+        self._versions = section(count)
+        self._name_ids = section(count)
+        self._department_offsets = section(count + 1)
+        self._department_ids = section(departments)
+        self._string_offsets = section(strings + 1)
+        self._string_base = position
+        if position + self._string_offsets[strings] > len(self._mmap):
+            raise SnapshotFormatError("ملف اللقطة الثنائية غير مكتمل")
+
+    def close(self):
+        for data in (
+            *self._columns.values(), self._versions, self._name_ids,
+            self._department_offsets, self._department_ids, self._string_offsets,
+        ):
+            data.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self._count
+
+    def string(self, string_id):
+        text = self._strings.get(string_id)
+        if text is None:
+            start = self._string_base + self._string_offsets[string_id]
+            end = self._string_base + self._string_offsets[string_id + 1]
+            text = sys.intern(self._mmap[start:end].decode('utf-8'))
+            self._strings[string_id] = text
+        return text
+
+    def __getitem__(self, i):
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        start, end = self._department_offsets[i], self._department_offsets[i + 1]
+        return College(
+            self.string(self._name_ids[i]),
+            *(self._columns[field][i] for field in COLLEGE_FIELDS),
+            departments=tuple(self.string(j) for j in self._department_ids[start:end]),
+            version=self._versions[i],
+        )
+
+    def __iter__(self):
+        return (self[i] for i in range(self._count))
+
+    def table(self):
+        """CollegeTable بنسخ الأعمدة الرقمية دفعة واحدة وفك كل نص مرة واحدة"""
+        def copy(data):
+            return array('q', data.tobytes())
+
+        return CollegeTable(
+            [self.string(i) for i in self._name_ids],
+            {field: copy(column) for field, column in self._columns.items()},
+            copy(self._versions),
+            copy(self._department_offsets),
+            [self.string(i) for i in self._department_ids],
+        )
+
+
+def json_to_snapshot(json_path, snapshot_path, data_version=0):
+    """تحويل ملف colleges.json إلى لقطة ثنائية"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        colleges = [College.from_dict(college) for college in json.load(f)]
+    write_snapshot(snapshot_path, colleges, data_version)
+    return len(colleges)
+
+
+def snapshot_to_json(snapshot_path, json_path):
+    """تحويل لقطة ثنائية إلى ملف colleges.json بالصيغة المعتادة"""
+    with SnapshotReader(snapshot_path) as reader:
+        colleges = [college.to_dict() for college in reader]
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(colleges, f, ensure_ascii=False, indent=2)
+    return len(colleges)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="تحويل بيانات الكليات بين JSON واللقطة الثنائية")
+    parser.add_argument('direction', choices=['to-binary', 'to-json'])
+    parser.add_argument('source')
+    parser.add_argument('target')
+    args = parser.parse_args()
+    if args.direction == 'to-binary':
+        print(json_to_snapshot(args.source, args.target))
+    else:
+        print(snapshot_to_json(args.source, args.target))
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+# مفاتيح إحصائيات الأقسام مع حقل الكلية المقابل لكل منها، بنفس ترتيب أعمدة
+# جدول إحصائيات الأقسام في app.py
+DEPARTMENT_METRICS = {
+    'total_students': 'students_count',
+    'foreign_students': 'foreign_students',
+    'graduate_students': 'graduate_students',
+    'dorm_students': 'dorm_students',
+    'evening_students': 'evening_students',
+    'evening_hosted_students': 'evening_hosted_students',
+}
+
+
+def department_frame(table):
+    """
+    تفكيك جدول الكليات (CollegeTable) إلى جدول بصف لكل قسم: اسم الكلية واسم
+    القسم وحصة القسم من كل إحصائية (إحصائيات الكلية مقسومة بالتساوي على أقسامها)
+    """
+    counts = np.diff(np.frombuffer(table.department_offsets, dtype=np.int64))
+    values = np.column_stack([
+        np.frombuffer(table.column(field), dtype=np.int64)
+        for field in DEPARTMENT_METRICS.values()
+    ]).astype(np.float64).reshape(len(table), len(DEPARTMENT_METRICS))
+    has_departments = counts > 0
+    shares = values[has_departments] / counts[has_departments, None]
+    frame = pd.DataFrame(
+        np.repeat(shares, counts[has_departments], axis=0),
+        columns=list(DEPARTMENT_METRICS),
+    )
+    frame.insert(0, 'department', pd.Series(table.department_names, dtype=object))
+    frame.insert(0, 'college', np.repeat(np.asarray(table.names, dtype=object), counts))
+    return frame
+
+
+def department_stats(table, college_names=None):
+    """
+    مجموع حصص كل قسم عبر الكليات، مع إمكانية التصفية بكلية أو عدة كليات.
+    الناتج جدول بصف لكل قسم وعمود لكل إحصائية من DEPARTMENT_METRICS.
+    """
+    frame = department_frame(table)
+    if college_names is not None:
+        if isinstance(college_names, str):
+            college_names = [college_names]
+        frame = frame[frame['college'].isin(college_names)]
+    return frame.groupby('department', sort=False)[list(DEPARTMENT_METRICS)].sum()
@@ -0,0 +1,1057 @@
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+from college_records import COLLEGE_FIELDS, College, clean_upsert_record, field_value
+from college_snapshot import SnapshotReader, write_snapshot
+
+class StaleEditError(Exception):
+    """تعديل مبني على نسخة قديمة من بيانات الكلية بعد أن عدّلها مستخدم آخر"""
+
+    def __init__(self, college_name):
+        super().__init__(college_name)
+        self.college_name = college_name
+
+
+# ذاكرة مؤقتة مشتركة على مستوى العملية لقائمة الكليات بعد تحميلها.
+# كل مدخل مرتبط بمسار مصدر البيانات ويُتحقق من صلاحيته عبر توقيع يحدده
+# المخزن (وقت التعديل والحجم لملف JSON، ورقم الإصدار لقاعدة SQLite)،
+# فلا يُعاد التحميل إلا عند تغير البيانات فعلاً (من هذه الجلسة أو غيرها).
+_colleges_cache = {}
+_colleges_cache_lock = threading.Lock()
+
+
+def _cached(path, signature):
+    with _colleges_cache_lock:
+        entry = _colleges_cache.get(path)
+        if entry is not None and entry['signature'] == signature:
+            return entry
+    return None
+
+
+def _previous_cache(path):
+    with _colleges_cache_lock:
+        return _colleges_cache.get(path)
+
+
+def _store_cache(path, colleges, signature, version=0, **extra):
+    index = {}
+    for college in colleges:
+        index.setdefault(college.name, college)
+    entry = {
+        'signature': signature,
+        'version': version,
+        'colleges': colleges,
+        'index': index,
+        **extra,
+    }
+    with _colleges_cache_lock:
+        _colleges_cache[path] = entry
+    return entry
+
+
+# المجاميع المحفوظة لكل كلية وعلى مستوى الجامعة: الحقول الرقمية وعدد الأقسام
+TOTAL_FIELDS = COLLEGE_FIELDS + ['departments']
+
+
+def _empty_college_totals():
+    return dict.fromkeys(['colleges'] + TOTAL_FIELDS, 0)
+
+
+def compute_totals(colleges):
+    """
+    مجاميع الكليات: university للجامعة كاملة، و colleges لكل اسم كلية.
+    الحقل colleges داخل كل مجموع هو عدد سجلات الكليات المشمولة فيه.
+    """
+    totals = {'university': _empty_college_totals(), 'colleges': {}}
+    for college in colleges:
+        _adjust_totals(totals, college, 1)
+    return totals
+
+
+def _copy_totals(totals):
+    """نسخة يمكن تعديلها دون المساس بالمجاميع المشتركة في الذاكرة المؤقتة"""
+    return {'university': dict(totals['university']), 'colleges': dict(totals['colleges'])}
+
+
+def _adjust_totals(totals, college, sign):
+    """إضافة (sign=1) أو طرح (sign=-1) إحصائيات كلية واحدة من المجاميع"""
+    name = college.name
+    university = totals['university']
+    per_college = dict(totals['colleges'].get(name) or _empty_college_totals())
+    university['colleges'] += sign
+    per_college['colleges'] += sign
+    for field in COLLEGE_FIELDS:
+        value = sign * getattr(college, field)
+        university[field] += value
+        per_college[field] += value
+    departments = sign * len(college.departments)
+    university['departments'] += departments
+    per_college['departments'] += departments
+    if per_college['colleges']:
+        totals['colleges'][name] = per_college
+    else:
+        totals['colleges'].pop(name, None)
+
+
+def _checked(college):
+    """رفض سجل كلية بقيم من نوع غير صحيح قبل أن يدخل القائمة أو المجاميع"""
+    if not isinstance(college.name, str):
+        raise TypeError(f"اسم كلية غير صالح: {college.name!r}")
+    for field in COLLEGE_FIELDS:
+        value = getattr(college, field)
+        if type(value) is not int:
+            raise TypeError(f"قيمة غير صالحة للحقل {field}: {value!r}")
+        field_value(field, value)
+    if not all(isinstance(dept, str) for dept in college.departments):
+        raise TypeError(f"أسماء أقسام غير صالحة للكلية {college.name}")
+    return college
+
+
+def _apply_entry(colleges, entry, totals=None):
+    """
+    تطبيق عملية واحدة من سجل التعديلات على قائمة الكليات في مكانها.
+    السجلات المعدلة تُستبدل بنسخ جديدة ولا تُعدل السجلات الأصلية،
+    لأنها قد تكون مشتركة مع الذاكرة المؤقتة. تُحدَّث المجاميع totals
+    (إن مُررت) بفرق السجلات المتغيرة فقط. السجلات الجديدة تُبنى وتُفحص قبل
+    أي تعديل، فالعملية التي يتعذر تطبيقها لا تغير القائمة ولا المجاميع.
+    """
+    op = entry['op']
+    if op == 'add':
+        college = _checked(College.from_dict(entry['college'], version=entry['v']))
+        colleges.append(college)
+        if totals is not None:
+            _adjust_totals(totals, college, 1)
+        return
+    if op == 'delete':
+        kept = []
+        for college in colleges:
+            if college.name != entry['name']:
+                kept.append(college)
+            elif totals is not None:
+                _adjust_totals(totals, college, -1)
+        colleges[:] = kept
+        return
+    if op == 'upsert':
+        _apply_upsert(colleges, entry['colleges'], entry['v'], totals)
+        return
+    for i, previous in enumerate(colleges):
+        if previous.name != entry['college_name']:
+            continue
+        departments = list(previous.departments)
+        if op == 'update':
+            if entry.get('departments') is not None:
+                departments = list(entry['departments'])
+        elif op == 'add_department':
+            if entry['department'] not in departments:
+                departments.append(entry['department'])
+        elif op == 'remove_department':
+            if entry['department'] in departments:
+                departments.remove(entry['department'])
+        else:
+            raise ValueError(f"عملية غير معروفة في سجل التعديلات: {op}")
+        college = _checked(previous.with_changes(
+            **(entry['fields'] if op == 'update' else {}),
+            departments=departments,
+            version=entry['v'],
+        ))
+        colleges[i] = college
+        if totals is not None:
+            _adjust_totals(totals, previous, -1)
+            _adjust_totals(totals, college, 1)
+        return
+
+
+def _apply_upsert(colleges, records, version, totals=None):
+    """
+    إضافة أو تحديث دفعة من الكليات بالاسم. الحقول غير الموجودة في السجل
+    تبقى كما هي، والأقسام الجديدة تُضاف إلى أقسام الكلية الحالية.
+    """
+    positions = {}
+    for i, college in enumerate(colleges):
+        positions.setdefault(college.name, i)
+    existing = size = len(colleges)
+    # تُبنى كل سجلات الدفعة أولاً (الجديدة بمواضع بعد نهاية القائمة) ثم تُطبق
+    updated = {}
+    for record in records:
+        fields = {k: v for k, v in record.items() if k != 'departments'}
+        i = positions.get(record['name'])
+        if i is None:
+            i = positions[record['name']] = size
+            size += 1
+            previous = College(record['name'])
+        else:
+            previous = updated.get(i) or colleges[i]
+        departments = list(previous.departments)
+        for department in record.get('departments', []):
+            if department not in departments:
+                departments.append(department)
+        updated[i] = _checked(
+            previous.with_changes(**fields, departments=departments, version=version)
+        )
+    for i, college in sorted(updated.items()):
+        if i < existing:
+            if totals is not None:
+                _adjust_totals(totals, colleges[i], -1)
+            colleges[i] = college
+        else:
+            colleges.append(college)
+        if totals is not None:
+            _adjust_totals(totals, college, 1)
+
+
+def _clean_records(records):
+    """سجلات bulk_upsert بعد التحقق منها، مع رقم السجل في رسالة أول خطأ"""
+    cleaned = []
+    for number, record in enumerate(records, start=1):
+        try:
+            cleaned.append(clean_upsert_record(record))
+        except ValueError as e:
+            raise ValueError(f"السجل رقم {number}: {e}") from None
+    return cleaned
+
+
+def _replay(colleges, totals, entries, version):
+    """
+    تطبيق سطور السجل الأحدث من الإصدار version بالترتيب، وإعادة (آخر إصدار،
+    السطور المرفوضة). السطر الذي يتعذر تطبيقه يُتخطى بدلاً من إيقاف تحميل
+    المخزن كله، ويُنقل إلى ملف السجلات المرفوضة عند الدمج التالي.
+    """
+    rejected = []
+    for entry in entries:
+        if entry['v'] <= version:
+            continue
+        try:
+            _apply_entry(colleges, entry, totals)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append(entry)
+        version = entry['v']
+    return version, rejected
+
+
+def _stat_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _read_journal(path, offset=0):
+    """
+    قراءة سطور السجل ابتداءً من الموضع offset، مع موضع نهاية آخر سطر سليم.
+    السطر الأخير غير المكتمل (كتابة منقطعة) يُتجاهل.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return _read_journal_file(f, offset)
+    except FileNotFoundError:
+        return [], offset
+
+
+def _read_journal_file(f, offset):
+    entries = []
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b'\n'):
+            break
+        try:
+            entries.append(json.loads(line))
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            break
+        offset += len(line)
+    return entries, offset
+
+
+def _truncate_torn_tail(path):
+    """إزالة سطر أخير غير مكتمل من السجل قبل الإضافة إليه"""
+    try:
+        f = open(path, 'rb+')
+    except FileNotFoundError:
+        return
+    with f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            newline = chunk.rfind(b'\n')
+            if newline != -1:
+                f.truncate(position + newline + 1)
+                return
+        f.truncate(0)
+
+
+def atomic_write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# مسارات الملفات التي تجري لها عملية ضغط حالياً داخل هذه العملية
+_compacting_paths = set()
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def _write_lock(path):
+    with _write_locks_guard:
+        return _write_locks.setdefault(path, threading.Lock())
+
+
+class FileLock:
+    """
+    قفل كتابة حصري يجمع قفل الخيوط داخل العملية مع قفل fcntl الاستشاري
+    بين العمليات، حتى لا تتداخل كتابات جلسات Streamlit المختلفة
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = _write_lock(path)
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        finally:
+            self._thread_lock.release()
+        return False
+
+
+class JsonCollegeStore:
+    """
+    تخزين الكليات في ملف JSON (اللقطة) مع سجل تعديلات يُضاف إليه فقط.
+    كل تعديل يكتب سطراً واحداً في السجل، وعند التحميل يُعاد تطبيق السجل
+    على آخر لقطة. عندما يتجاوز السجل حجماً معيناً يُدمج في لقطة جديدة
+    في الخلفية.
+
+    الملفات المستخدمة بجانب اللقطة:
+    - colleges.journal: سطر JSON لكل عملية مع رقم إصدار متزايد (v)
+    - colleges.journal.compacting: السجل المُدوّر أثناء الدمج
+    - colleges.meta.json: إصدار اللقطة وبصمتها (الحجم ووقت التعديل) والسابقة لها،
+      ومجاميع الإحصائيات عند ذلك الإصدار (انظر compute_totals)
+    - colleges.rejected: سطور السجل التي تعذر تطبيقها، تُنقل إليه عند الدمج
+    - colleges.lock و colleges.compact.lock: ملفا قفل fcntl للكتابة والدمج
+    - colleges.bin: نسخة ثنائية اختيارية من اللقطة (binary_snapshot=True، انظر
+      college_snapshot) تُكتب مع كل دمج وتُحمّل عبر mmap بدلاً من تحليل JSON
+
+    رقم الإصدار (v) هو إصدار البيانات المتزايد، ويحمل كل سجل كلية في الحقل
+    version رقم آخر إصدار عدّله، ليتمكن update_college من كشف التعديلات القديمة.
+    """
+
+    def __init__(self, file_path='data/colleges.json', compact_threshold=256 * 1024,
+                 binary_snapshot=False):
+        self.file_path = file_path
+        base = os.path.splitext(file_path)[0]
+        self.snapshot_path = f"{base}.bin"
+        self.binary_snapshot = binary_snapshot
+        self.journal_path = f"{base}.journal"
+        self.compacting_path = f"{self.journal_path}.compacting"
+        self.meta_path = f"{base}.meta.json"
+        self.rejected_path = f"{base}.rejected"
+        self.lock_path = f"{base}.lock"
+        self.compact_lock_path = f"{base}.compact.lock"
+        self.compact_threshold = compact_threshold
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if not os.path.exists(file_path):
+            with open(file_path, 'w', encoding='utf-8') as f:
+                json.dump([], f)
+
+    def _signature(self):
+        return tuple(
+            _stat_signature(path)
+            for path in (self.file_path, self.meta_path, self.compacting_path, self.journal_path)
+        )
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'version': 0, 'fingerprint': None, 'previous': None}
+
+    def _base_version(self, meta):
+        """
+        إصدار البيانات الذي تمثله اللقطة الحالية. تُكتب البيانات الوصفية قبل
+        استبدال اللقطة، فإذا انقطع الدمج بينهما تطابق اللقطة البصمة السابقة.
+        """
+        fingerprint = list(_stat_signature(self.file_path))
+        previous = meta.get('previous')
+        if fingerprint != meta['fingerprint'] and previous and fingerprint == previous['fingerprint']:
+            return previous['version']
+        return meta['version']
+
+    def _binary_snapshot_valid(self, meta):
+        """اللقطة الثنائية صالحة إذا كُتبت مع لقطة JSON الحالية نفسها"""
+        binary = meta.get('binary')
+        return (
+            self.binary_snapshot
+            and binary is not None
+            and list(_stat_signature(self.file_path)) == meta['fingerprint']
+            and _stat_signature(self.snapshot_path) is not None
+            and list(_stat_signature(self.snapshot_path)) == binary
+        )
+
+    def load(self):
+        signature = self._signature()
+        entry = _cached(self.file_path, signature)
+        if entry is None:
+            entry = self._load_journal_tail(signature)
+        if entry is None:
+            with FileLock(self.lock_path):
+                entry = self._load_locked()
+        return entry
+
+    def _load_locked(self):
+        """
+        تحميل كامل تحت قفل الكتابة، حتى لا تتداخل قراءة اللقطة والسجلات
+        مع تدوير السجل أو استبدال اللقطة من عملية أخرى
+        """
+        signature = self._signature()
+        entry = _cached(self.file_path, signature)
+        if entry is not None:
+            return entry
+        entry = self._load_journal_tail(signature)
+        if entry is not None:
+            return entry
+        meta = self._read_meta()
+        table = None
+        if self._binary_snapshot_valid(meta):
+            with SnapshotReader(self.snapshot_path) as reader:
+                table = reader.table()
+            colleges = table.records()
+        else:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                colleges = [College.from_dict(college) for college in json.load(f)]
+            if self.binary_snapshot:
+                # إنشاء اللقطة الثنائية في الخلفية ليستفيد منها التحميل التالي
+                self._start_compaction()
+        compacting, _ = _read_journal(self.compacting_path)
+        base_version = self._base_version(meta)
+        # المجاميع المحفوظة صالحة فقط إذا كانت اللقطة هي نفسها التي كُتبت معها
+        if meta.get('totals') and list(_stat_signature(self.file_path)) == meta['fingerprint']:
+            totals = meta['totals']
+        else:
+            totals = compute_totals(colleges)
+        journal, journal_offset = _read_journal(self.journal_path)
+        version, rejected = _replay(colleges, totals, compacting + journal, base_version)
+        if version != base_version:
+            table = None
+        extra = {'table': table} if table is not None else {}
+        return _store_cache(
+            self.file_path, colleges, signature, version,
+            journal_offset=journal_offset, totals=totals, rejected=rejected, **extra
+        )
+
+    def _load_journal_tail(self, signature):
+        """
+        إذا لم يتغير سوى نمو السجل منذ آخر تحميل، تُطبق السطور الجديدة فقط
+        على النسخة المخزنة بدلاً من إعادة تحليل اللقطة والسجل بالكامل
+        """
+        previous = _previous_cache(self.file_path)
+        if previous is None or previous['signature'][:3] != signature[:3]:
+            return None
+        journal_signature = signature[3]
+        previous_journal = previous['signature'][3]
+        if journal_signature is None:
+            return None
+        if previous_journal is not None and previous_journal[2] != journal_signature[2]:
+            return None
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            # قد يُدوَّر السجل بين فحص التوقيع وفتح الملف
+            if os.fstat(f.fileno()).st_ino != journal_signature[2]:
+                return None
+            entries, journal_offset = _read_journal_file(f, previous['journal_offset'])
+        colleges = list(previous['colleges'])
+        totals = _copy_totals(previous['totals'])
+        version, rejected = _replay(colleges, totals, entries, previous['version'])
+        return _store_cache(
+            self.file_path, colleges, signature, version,
+            journal_offset=journal_offset, totals=totals,
+            rejected=previous['rejected'] + rejected
+        )
+
+    def data_version(self):
+        return self.load()['version']
+
+    def _append(self, entry, check=None):
+        with FileLock(self.lock_path):
+            current = self._load_locked()
+            if check is not None:
+                check(current)
+            entry = dict(entry, v=current['version'] + 1)
+            # التطبيق على نسخ أولاً: العملية التي يتعذر تطبيقها لا تُكتب في السجل
+            colleges = list(current['colleges'])
+            totals = _copy_totals(current['totals'])
+            _apply_entry(colleges, entry, totals)
+            line = json.dumps(entry, ensure_ascii=False) + '\n'
+            _truncate_torn_tail(self.journal_path)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            journal_size = os.path.getsize(self.journal_path)
+            _store_cache(
+                self.file_path, colleges, self._signature(), entry['v'],
+                journal_offset=journal_size, totals=totals, rejected=current['rejected']
+            )
+        if journal_size > self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        with _write_locks_guard:
+            if self.file_path in _compacting_paths:
+                return
+            _compacting_paths.add(self.file_path)
+        threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception:
+            # يبقى السجل صالحاً عند فشل الدمج وستُعاد المحاولة مع الكتابة التالية
+            pass
+        finally:
+            with _write_locks_guard:
+                _compacting_paths.discard(self.file_path)
+
+    def compact(self):
+        """دمج سجل التعديلات في لقطة جديدة ثم حذفه"""
+        fd = os.open(self.compact_lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # عملية أخرى تدمج السجل حالياً
+                return
+            self._compact_locked()
+        finally:
+            os.close(fd)
+
+    def _compact_locked(self):
+        with FileLock(self.lock_path):
+            if not os.path.exists(self.compacting_path):
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, self.compacting_path)
+                elif not self.binary_snapshot or self._binary_snapshot_valid(self._read_meta()):
+                    return
+            entry = self._load_locked()
+        # كتابة اللقطة الجديدة (الجزء الأثقل) تتم خارج قفل الكتابة
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                [college.to_dict() for college in entry['colleges']],
+                f, ensure_ascii=False, indent=2
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        fingerprint = _stat_signature(tmp_path)
+        new_meta = {
+            'version': entry['version'],
+            'fingerprint': list(fingerprint),
+            'totals': entry['totals'],
+        }
+        snapshot_tmp_path = f"{self.snapshot_path}.tmp"
+        if self.binary_snapshot:
+            write_snapshot(snapshot_tmp_path, entry['colleges'], entry['version'])
+            new_meta['binary'] = list(_stat_signature(snapshot_tmp_path))
+        with FileLock(self.lock_path):
+            meta = self._read_meta()
+            new_meta['previous'] = {
+                'version': self._base_version(meta),
+                'fingerprint': list(_stat_signature(self.file_path)),
+            }
+            if entry['rejected']:
+                # السطور المرفوضة لا تدخل اللقطة الجديدة؛ تُحفظ قبل حذف السجل
+                with open(self.rejected_path, 'a', encoding='utf-8') as f:
+                    for rejected in entry['rejected']:
+                        f.write(json.dumps(rejected, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+            atomic_write_json(self.meta_path, new_meta)
+            os.replace(tmp_path, self.file_path)
+            if self.binary_snapshot:
+                os.replace(snapshot_tmp_path, self.snapshot_path)
+            if os.path.exists(self.compacting_path):
+                os.remove(self.compacting_path)
+
+    def add_college(self, college):
+        self._append({'op': 'add', 'college': college.to_dict()})
+
+    def bulk_upsert(self, records):
+        self._append({'op': 'upsert', 'colleges': _clean_records(records)})
+
+    def update_college(self, old_name, fields, departments=None, expected_version=None):
+        def check(current):
+            if expected_version is None:
+                return
+            college = current['index'].get(old_name)
+            if college is None or college.version != expected_version:
+                raise StaleEditError(old_name)
+
+        self._append({
+            'op': 'update',
+            'college_name': old_name,
+            'fields': fields,
+            'departments': departments,
+        }, check)
+
+    def add_department(self, college_name, department_name):
+        self._append({
+            'op': 'add_department',
+            'college_name': college_name,
+            'department': department_name,
+        })
+
+    def remove_department(self, college_name, department_name):
+        self._append({
+            'op': 'remove_department',
+            'college_name': college_name,
+            'department': department_name,
+        })
+
+    def delete_college(self, name):
+        self._append({'op': 'delete', 'name': name})
+
+
+class SqliteCollegeStore:
+    """
+    تخزين الكليات في قاعدة SQLite (وضع WAL) بجدولين للكليات والأقسام،
+    بحيث يكتب كل تعديل الصفوف المتأثرة فقط داخل معاملة واحدة. مجاميع
+    الإحصائيات محفوظة في جدول totals (صف للجامعة وصف لكل اسم كلية، انظر
+    compute_totals) ويُحدّث كل تعديل صفوف الكليات المتأثرة وصف الجامعة فقط
+    """
+
+    # أقصى عدد معرفات في استعلام IN واحد (حد متغيرات SQLite في الإصدارات القديمة)
+    _ID_CHUNK = 500
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS colleges (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            students_count INTEGER NOT NULL DEFAULT 0,
+            foreign_students INTEGER NOT NULL DEFAULT 0,
+            graduate_students INTEGER NOT NULL DEFAULT 0,
+            dorm_students INTEGER NOT NULL DEFAULT 0,
+            evening_students INTEGER NOT NULL DEFAULT 0,
+            evening_hosted_students INTEGER NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_colleges_name ON colleges(name);
+        CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY,
+            college_id INTEGER NOT NULL REFERENCES colleges(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_departments_college
+            ON departments(college_id, position);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0');
+        CREATE TABLE IF NOT EXISTS totals (
+            scope TEXT NOT NULL,
+            name TEXT NOT NULL,
+            colleges INTEGER NOT NULL DEFAULT 0,
+            students_count INTEGER NOT NULL DEFAULT 0,
+            foreign_students INTEGER NOT NULL DEFAULT 0,
+            graduate_students INTEGER NOT NULL DEFAULT 0,
+            dorm_students INTEGER NOT NULL DEFAULT 0,
+            evening_students INTEGER NOT NULL DEFAULT 0,
+            evening_hosted_students INTEGER NOT NULL DEFAULT 0,
+            departments INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, name)
+        );
+    """
+    # أعمدة جدول totals بترتيب مفاتيح compute_totals
+    _TOTAL_COLUMNS = ['colleges'] + TOTAL_FIELDS
+
+    def __init__(self, db_path='data/colleges.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(colleges)")]
+        if 'version' not in columns:
+            conn.execute("ALTER TABLE colleges ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._init_totals()
+
+    def _init_totals(self):
+        """حساب جدول المجاميع مرة واحدة لقاعدة أُنشئت قبل إضافته"""
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'totals_table'").fetchone():
+                return
+            conn.execute("DELETE FROM totals")
+            conn.execute("DELETE FROM meta WHERE key = 'totals'")
+            delta = {}
+            for college in self._read_colleges(conn).values():
+                self._college_delta(delta, college, 1)
+            self._apply_totals_delta(conn, delta)
+            conn.execute("INSERT INTO meta (key, value) VALUES ('totals_table', '1')")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, mode="IMMEDIATE"):
+        return Transaction(self._connection(), mode)
+
+    def _bump_version(self, conn):
+        conn.execute(
+            "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'data_version'"
+        )
+        return self._signature()
+
+    def _signature(self):
+        row = self._connection().execute(
+            "SELECT value FROM meta WHERE key = 'data_version'"
+        ).fetchone()
+        return int(row[0])
+
+    def data_version(self):
+        return self._signature()
+
+    def load(self):
+        signature = self._signature()
+        entry = _cached(self.db_path, signature)
+        if entry is not None:
+            return entry
+        conn = self._connection()
+        with self._transaction("DEFERRED"):
+            signature = self._signature()
+            colleges = list(self._read_colleges(conn).values())
+            totals = self._read_totals(conn)
+        return _store_cache(self.db_path, colleges, signature, signature, totals=totals)
+
+    def _read_colleges(self, conn, college_ids=None):
+        """الكليات (كلها أو ذات المعرفات college_ids) بصيغة {المعرف: College}"""
+        select = f"SELECT id, name, {', '.join(COLLEGE_FIELDS)}, version FROM colleges"
+        select_departments = "SELECT college_id, name FROM departments"
+        if college_ids is None:
+            queries = [(select, select_departments, [])]
+        else:
+            college_ids = list(college_ids)
+            queries = []
+            for start in range(0, len(college_ids), self._ID_CHUNK):
+                chunk = college_ids[start:start + self._ID_CHUNK]
+                marks = ', '.join('?' * len(chunk))
+                queries.append((
+                    f"{select} WHERE id IN ({marks})",
+                    f"{select_departments} WHERE college_id IN ({marks})",
+                    chunk,
+                ))
+        rows, departments = [], {}
+        for college_sql, departments_sql, params in queries:
+            rows.extend(conn.execute(college_sql + " ORDER BY id", params))
+            for college_id, name in conn.execute(
+                departments_sql + " ORDER BY college_id, position", params
+            ):
+                departments.setdefault(college_id, []).append(name)
+        rows.sort(key=lambda row: row[0])
+        return {
+            row[0]: College(
+                *row[1:-1], departments=tuple(departments.get(row[0], ())), version=row[-1]
+            )
+            for row in rows
+        }
+
+    def _read_totals(self, conn):
+        totals = {'university': _empty_college_totals(), 'colleges': {}}
+        for scope, name, *values in conn.execute(
+            f"SELECT scope, name, {', '.join(self._TOTAL_COLUMNS)} FROM totals"
+        ):
+            row = dict(zip(self._TOTAL_COLUMNS, values))
+            if scope == 'university':
+                totals['university'] = row
+            else:
+                totals['colleges'][name] = row
+        return totals
+
+    def _college_delta(self, delta, college, sign):
+        """إضافة فرق كلية واحدة (sign=1 أو -1) إلى {اسم الكلية: قيم أعمدة totals}"""
+        row = delta.setdefault(college.name, [0] * len(self._TOTAL_COLUMNS))
+        row[0] += sign
+        for i, field in enumerate(COLLEGE_FIELDS, start=1):
+            row[i] += sign * getattr(college, field)
+        row[-1] += sign * len(college.departments)
+
+    def _colleges_delta(self, conn, delta, college_ids, sign):
+        for college in self._read_colleges(conn, college_ids).values():
+            self._college_delta(delta, college, sign)
+
+    def _apply_totals_delta(self, conn, delta):
+        """إضافة الفروق إلى صفوف الكليات المتأثرة وصف الجامعة، وحذف صفوف الكليات المحذوفة"""
+        if not delta:
+            return
+        university = [sum(column) for column in zip(*delta.values())]
+        columns = ', '.join(self._TOTAL_COLUMNS)
+        conn.executemany(
+            f"INSERT INTO totals (scope, name, {columns}) "
+            f"VALUES (?, ?, {', '.join('?' * len(self._TOTAL_COLUMNS))}) "
+            "ON CONFLICT (scope, name) DO UPDATE SET "
+            + ', '.join(f"{c} = {c} + excluded.{c}" for c in self._TOTAL_COLUMNS),
+            [('university', '', *university)]
+            + [('college', name, *row) for name, row in delta.items()]
+        )
+        conn.executemany(
+            "DELETE FROM totals WHERE scope = 'college' AND name = ? AND colleges = 0",
+            [(name,) for name in delta]
+        )
+
+    def _find_college(self, conn, name):
+        return conn.execute(
+            "SELECT id, version FROM colleges WHERE name = ? ORDER BY id LIMIT 1", (name,)
+        ).fetchone()
+
+    def _touch_college(self, conn, college_id):
+        version = self._bump_version(conn)
+        conn.execute("UPDATE colleges SET version = ? WHERE id = ?", (version, college_id))
+
+    def _insert_departments(self, conn, college_id, departments, start=0):
+        conn.executemany(
+            "INSERT INTO departments (college_id, position, name) VALUES (?, ?, ?)",
+            [(college_id, start + i, dept) for i, dept in enumerate(departments)]
+        )
+
+    def _insert_college(self, conn, college):
+        cursor = conn.execute(
+            f"INSERT INTO colleges (name, {', '.join(COLLEGE_FIELDS)}) "
+            f"VALUES ({', '.join('?' * (len(COLLEGE_FIELDS) + 1))})",
+            [college.name] + [getattr(college, field) for field in COLLEGE_FIELDS]
+        )
+        self._insert_departments(conn, cursor.lastrowid, college.departments)
+        return cursor.lastrowid
+
+    def add_college(self, college):
+        _checked(college)
+        with self._transaction() as conn:
+            college_id = self._insert_college(conn, college)
+            self._touch_college(conn, college_id)
+            delta = {}
+            self._college_delta(delta, college, 1)
+            self._apply_totals_delta(conn, delta)
+
+    def bulk_upsert(self, records):
+        records = _clean_records(records)
+        with self._transaction() as conn:
+            college_ids = {}
+            for college_id, name in conn.execute(
+                "SELECT id, name FROM colleges ORDER BY id DESC"
+            ):
+                college_ids[name] = college_id
+            existing_departments = {}
+            next_position = {}
+            for college_id, position, name in conn.execute(
+                "SELECT college_id, position, name FROM departments"
+            ):
+                existing_departments.setdefault(college_id, set()).add(name)
+                next_position[college_id] = max(next_position.get(college_id, 0), position + 1)
+
+            # طرح الكليات الموجودة التي ستتغير من المجاميع قبل تعديلها
+            delta = {}
+            self._colleges_delta(conn, delta, {
+                college_ids[record['name']] for record in records if record['name'] in college_ids
+            }, -1)
+
+            touched = []
+            for record in records:
+                college_id = college_ids.get(record['name'])
+                if college_id is None:
+                    departments = record['departments']
+                    college_id = self._insert_college(conn, College.from_dict(record))
+                    college_ids[record['name']] = college_id
+                    existing_departments[college_id] = set(departments)
+                    next_position[college_id] = len(departments)
+                    touched.append(college_id)
+                    continue
+                columns = [field for field in COLLEGE_FIELDS if field in record]
+                if columns:
+                    conn.execute(
+                        f"UPDATE colleges SET {', '.join(f'{c} = ?' for c in columns)} "
+                        "WHERE id = ?",
+                        [record[c] for c in columns] + [college_id]
+                    )
+                departments = existing_departments.setdefault(college_id, set())
+                new_departments = [dept for dept in record['departments'] if dept not in departments]
+                start = next_position.get(college_id, 0)
+                self._insert_departments(conn, college_id, new_departments, start)
+                departments.update(new_departments)
+                next_position[college_id] = start + len(new_departments)
+                touched.append(college_id)
+
+            if touched:
+                version = self._bump_version(conn)
+                conn.executemany(
+                    "UPDATE colleges SET version = ? WHERE id = ?",
+                    [(version, college_id) for college_id in touched]
+                )
+                self._colleges_delta(conn, delta, set(touched), 1)
+                self._apply_totals_delta(conn, delta)
+
+    def update_college(self, old_name, fields, departments=None, expected_version=None):
+        fields = {
+            key: field_value(key, value) if key in COLLEGE_FIELDS else value
+            for key, value in fields.items()
+        }
+        with self._transaction() as conn:
+            row = self._find_college(conn, old_name)
+            if expected_version is not None and (row is None or row[1] != expected_version):
+                raise StaleEditError(old_name)
+            if row is None:
+                return
+            college_id = row[0]
+            delta = {}
+            self._colleges_delta(conn, delta, [college_id], -1)
+            columns = ['name'] + [field for field in COLLEGE_FIELDS if field in fields]
+            conn.execute(
+                f"UPDATE colleges SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                [fields[c] for c in columns] + [college_id]
+            )
+            if departments is not None:
+                conn.execute("DELETE FROM departments WHERE college_id = ?", (college_id,))
+                self._insert_departments(conn, college_id, departments)
+            self._touch_college(conn, college_id)
+            self._colleges_delta(conn, delta, [college_id], 1)
+            self._apply_totals_delta(conn, delta)
+
+    def add_department(self, college_name, department_name):
+        with self._transaction() as conn:
+            row = self._find_college(conn, college_name)
+            if row is None:
+                return
+            college_id = row[0]
+            exists = conn.execute(
+                "SELECT 1 FROM departments WHERE college_id = ? AND name = ?",
+                (college_id, department_name)
+            ).fetchone()
+            if exists:
+                return
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM departments WHERE college_id = ?",
+                (college_id,)
+            ).fetchone()[0]
+            self._insert_departments(conn, college_id, [department_name], position)
+            self._touch_college(conn, college_id)
+            self._apply_department_delta(conn, college_name, 1)
+
+    def remove_department(self, college_name, department_name):
+        with self._transaction() as conn:
+            row = self._find_college(conn, college_name)
+            if row is None:
+                return
+            college_id = row[0]
+            cursor = conn.execute(
+                "DELETE FROM departments WHERE id = ("
+                "SELECT id FROM departments WHERE college_id = ? AND name = ? "
+                "ORDER BY position LIMIT 1)",
+                (college_id, department_name)
+            )
+            if cursor.rowcount:
+                self._touch_college(conn, college_id)
+                self._apply_department_delta(conn, college_name, -1)
+
+    def _apply_department_delta(self, conn, college_name, change):
+        row = [0] * len(self._TOTAL_COLUMNS)
+        row[-1] = change
+        self._apply_totals_delta(conn, {college_name: row})
+
+    def delete_college(self, name):
+        with self._transaction() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM colleges WHERE name = ?", (name,))]
+            if not ids:
+                return
+            delta = {}
+            self._colleges_delta(conn, delta, ids, -1)
+            conn.execute("DELETE FROM colleges WHERE name = ?", (name,))
+            self._bump_version(conn)
+            self._apply_totals_delta(conn, delta)
+
+    def migrate_from_json(self, json_path='data/colleges.json'):
+        """
+        ترحيل لمرة واحدة من ملف colleges.json إلى قاعدة البيانات.
+        لا يُنفذ إذا سبق الترحيل أو كانت القاعدة تحتوي على كليات.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with self._transaction() as conn:
+            migrated = conn.execute(
+                "SELECT 1 FROM meta WHERE key = 'migrated_from_json'"
+            ).fetchone()
+            has_rows = conn.execute("SELECT 1 FROM colleges LIMIT 1").fetchone()
+            if migrated or has_rows:
+                return 0
+            # التحميل عبر مخزن JSON ليشمل العمليات المسجلة في سجل التعديلات
+            colleges = JsonCollegeStore(json_path).load()['colleges']
+            delta = {}
+            for college in colleges:
+                self._insert_college(conn, college)
+                self._college_delta(delta, college, 1)
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                (json_path,)
+            )
+            self._bump_version(conn)
+            self._apply_totals_delta(conn, delta)
+        return len(colleges)
+
+
+class Transaction:
+    """معاملة تُثبت عند النجاح وتُلغى عند أي استثناء"""
+
+    def __init__(self, conn, mode):
+        self.conn = conn
+        self.mode = mode
+
+    def __enter__(self):
+        self.conn.execute(f"BEGIN {self.mode}")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
@@ -0,0 +1,204 @@
+"""
+طابور مهام خلفية لمعالجة الملفات بعد رفعها (استخراج النص وفهرسته وغيرها).
+
+حالة كل مهمة محفوظة في قاعدة SQLite (data/jobs.db)، فالمهام غير المنتهية
+تُستأنف عند إعادة تشغيل التطبيق، والواجهة تقرأ التقدم من القاعدة. تُنفذ
+المهام في مجموعة خيوط محدودة، والأعمال الثقيلة على المعالج (مثل استخراج
+نص PDF) تُرسل إلى مجموعة عمليات بعدد أنوية الجهاز عبر run_cpu.
+"""
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from college_store import Transaction
+
+# حالات المهام
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# المهام المنتهية تُحذف من القاعدة بعد هذه المدة (بالثواني)
+FINISHED_RETENTION = 24 * 3600
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class JobQueue:
+    """
+    طابور مهام بحالة محفوظة. لكل نوع مهمة دالة معالجة تُسجل بـ register
+    وتُستدعى بالشكل handler(job, progress) حيث job قاموس بيانات المهمة
+    و progress(نسبة) تحدّث نسبة التقدم بين 0 و 1.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            college TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress REAL NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+        CREATE INDEX IF NOT EXISTS idx_jobs_college ON jobs(college, created_at);
+    """
+
+    def __init__(self, db_path='data/jobs.db', max_workers=None):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._handlers = {}
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+        cpus = os.cpu_count() or 1
+        self._threads = ThreadPoolExecutor(
+            max_workers=max_workers or min(32, cpus + 4), thread_name_prefix='file-job'
+        )
+        self._processes = None
+        self._processes_lock = threading.Lock()
+        self._resumed = False
+        self._resume_lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def register(self, kind, handler):
+        self._handlers[kind] = handler
+
+    def resume(self):
+        """
+        إعادة المهام التي لم تنته في تشغيل سابق إلى الطابور وحذف المنتهية
+        القديمة. تُنفذ مرة واحدة فقط لكل طابور، وتُستدعى بعد أن تصبح دوال
+        المعالجة وكل ما تحتاجه جاهزة.
+        """
+        with self._resume_lock:
+            if self._resumed:
+                return
+            self._resumed = True
+        conn = self._connection()
+        now = time.time()
+        with Transaction(conn, "IMMEDIATE"):
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, now - FINISHED_RETENTION)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = 0, updated_at = ? WHERE status = ?",
+                (QUEUED, now, RUNNING)
+            )
+            pending = [row['id'] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY id", (QUEUED,)
+            )]
+        for job_id in pending:
+            self._threads.submit(self._run, job_id)
+
+    def submit(self, kind, college_name, filename, digest):
+        """
+        إضافة مهمة إلى الطابور وإعادة رقمها. إذا كانت مهمة مماثلة (النوع
+        والملف والبصمة نفسها) بانتظار التنفيذ يُعاد رقمها دون تكرار.
+        """
+        conn = self._connection()
+        now = time.time()
+        with Transaction(conn, "IMMEDIATE"):
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE kind = ? AND college = ? AND filename = ? "
+                "AND sha256 = ? AND status = ?",
+                (kind, college_name, filename, digest, QUEUED)
+            ).fetchone()
+            if row is not None:
+                return row['id']
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, college, filename, sha256, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, college_name, filename, digest, QUEUED, now, now)
+            ).lastrowid
+        self._threads.submit(self._run, job_id)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        self._connection().execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id)
+        )
+
+    def _run(self, job_id):
+        conn = self._connection()
+        with Transaction(conn, "IMMEDIATE"):
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['status'] != QUEUED:
+                return
+            self._update(job_id, status=RUNNING)
+        job = dict(row)
+        handler = self._handlers.get(job['kind'])
+        try:
+            if handler is None:
+                raise KeyError(f"نوع مهمة غير معروف: {job['kind']}")
+            handler(job, lambda progress: self._update(job_id, progress=min(max(progress, 0), 1)))
+        except Exception as e:
+            self._update(job_id, status=FAILED, error=str(e))
+        else:
+            self._update(job_id, status=DONE, progress=1)
+
+    def run_cpu(self, func, *args):
+        """تنفيذ دالة ثقيلة على المعالج في مجموعة العمليات وانتظار نتيجتها"""
+        with self._processes_lock:
+            if self._processes is None:
+                # spawn بدلاً من fork لأن العملية الأم تحوي خيوطاً كثيرة (Streamlit)
+                self._processes = ProcessPoolExecutor(
+                    max_workers=os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+        return self._processes.submit(func, *args).result()
+
+    def jobs(self, college_name=None, active_only=False, limit=100):
+        """أحدث المهام (لكلية واحدة أو للجميع) بصيغة قواميس"""
+        sql = "SELECT * FROM jobs"
+        conditions, params = [], []
+        if college_name is not None:
+            conditions.append("college = ?")
+            params.append(college_name)
+        if active_only:
+            conditions.append("status IN (?, ?)")
+            params.extend((QUEUED, RUNNING))
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def shutdown(self, wait=True):
+        self._threads.shutdown(wait=wait)
+        if self._processes is not None:
+            self._processes.shutdown(wait=wait)
+
+
+def get_queue(db_path='data/jobs.db', setup=None):
+    """
+    طابور المهام المشترك لهذه العملية لمسار القاعدة المحدد. setup(queue)
+    تُستدعى مرة واحدة عند إنشائه لتسجيل دوال المعالجة. المهام غير المنتهية
+    من تشغيل سابق لا تُستأنف حتى يستدعي المستخدم queue.resume().
+    """
+    with _queues_lock:
+        queue = _queues.get(db_path)
+        if queue is None:
+            queue = JobQueue(db_path)
+            if setup is not None:
+                setup(queue)
+            _queues[db_path] = queue
+        return queue
@@ -1,45 +1,623 @@
+import hashlib
+import html
+import io
+import json
+import mimetypes
 import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
-import base64
+import file_server
+from blob_store import BlobStore, codec_of, open_blob
+from college_store import atomic_write_json
+from file_jobs import get_queue
+from file_search import SearchIndex, extract_normalized
+from perf_metrics import instrumented
 
+# مسارات مجلدات الملفات التي رُحّلت ملفاتها القديمة إلى مخزن المحتوى في هذه العملية
+_migrated_paths = set()
+_migrated_paths_lock = threading.Lock()
+
+# خيوط نسخ الملفات المرفوعة إلى المخزن، مشتركة بين الجلسات
+_upload_pool = ThreadPoolExecutor(
+    max_workers=min(8, (os.cpu_count() or 1) + 4), thread_name_prefix='file-upload'
+)
+
+# بيانات الكليات (manifest) المقروءة مؤخراً: المسار -> (مفتاح حالة الملف، المحتوى)
+_manifest_cache = {}
+
+# حقول الترتيب المدعومة في list_files
+SORT_FIELDS = ('name', 'size', 'uploaded_at', 'mtime')
+
+
+class QuotaExceededError(Exception):
+    """رفع الملف يتجاوز حصة التخزين المحددة للكلية"""
+
+    def __init__(self, college_name, used, quota):
+        self.college_name = college_name
+        self.used = used
+        self.quota = quota
+        super().__init__(
+            f"تجاوز حصة التخزين لـ {college_name}: المستخدم {format_size(used)} من {format_size(quota)}"
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """وجهة كتابة غير قابلة للتنقل تجمع ما يكتبه ZipFile حتى يُسحب بـ drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def format_size(size):
+    """عرض الحجم بالبايت بصيغة مقروءة"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+@instrumented('FileManager')
 class FileManager:
+    """
+    إدارة ملفات الكليات. محتوى الملفات محفوظ مرة واحدة لكل محتوى فريد في
+    مخزن BlobStore، ولكل كلية بيان (data/files/<الكلية>/.manifest.json)
+    يربط اسم كل ملف ببصمة محتواه، فرفع الملف نفسه لعدة كليات لا يكلف
+    إلا مدخلاً في بيان كل منها.
+
+    البيان هو أيضاً فهرس بيانات الملفات: لكل اسم الحجم والبصمة ونوع MIME
+    والمستخدم الذي رفعه ووقت الرفع الأول (uploaded_at) ووقت آخر تغيير
+    للمحتوى (mtime)، فعرض قائمة الملفات لا يحتاج إلى listdir أو stat لكل ملف.
+
+    عدد ملفات كل كلية ومجموع أحجامها محفوظان في data/files/.usage.json
+    ويُحدّثان مع كل حفظ وحذف، فعرض الاستخدام وفحص الحصة لا يمران على الملفات.
+    """
+    # حجم الجزء المقروء من الملف المرفوع في كل مرة أثناء الحفظ
+    CHUNK_SIZE = 1024 * 1024
+    # الملفات الأكبر من هذا الحجم تُنزّل عبر خادم التنزيل المحلي
+    INLINE_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+    # طريقة ضغط كل نوع ملف عند تفعيل التخزين المضغوط (FILE_COMPRESSION=1)؛
+    # الأنواع المضغوطة أصلاً (docx والصور وغيرها) تُحفظ كما هي
+    COMPRESSION = {
+        '.txt': 'lzma',
+        '.csv': 'lzma',
+        '.pdf': 'gzip',
+    }
+    # أنواع الملفات المضغوطة أصلاً تُضاف إلى أرشيف ZIP دون ضغط
+    ARCHIVE_STORED = {'.docx', '.xlsx', '.pptx', '.zip', '.gz', '.xz', '.jpg', '.jpeg', '.png'}
+    # مهام المعالجة اللاحقة التي تُضاف إلى طابور المهام بعد حفظ كل ملف
+    POST_PROCESSING = ('index',)
+
     def __init__(self):
         self.base_path = 'data/files'
+        self.usage_path = os.path.join(self.base_path, '.usage.json')
+        self.blobs = BlobStore('data/blobs', chunk_size=self.CHUNK_SIZE)
+        self.compression = os.environ.get('FILE_COMPRESSION', '0') == '1'
+        # FILE_QUOTA_MB يحدد الحد الأقصى لمجموع أحجام ملفات كل كلية (0 بلا حد)
+        self.quota_bytes = int(float(os.environ.get('FILE_QUOTA_MB', '0')) * 1024 * 1024)
+        self.search_index = SearchIndex('data/search.db')
+        self.jobs = get_queue('data/jobs.db', setup=self._register_jobs)
         self._init_storage()
+        # استئناف مهام التشغيل السابق بعد أن أصبح self.jobs والتخزين جاهزين
+        self.jobs.resume()
 
     def _init_storage(self):
         if not os.path.exists(self.base_path):
             os.makedirs(self.base_path)
+        with _migrated_paths_lock:
+            if self.base_path in _migrated_paths:
+                return
+            _migrated_paths.add(self.base_path)
+        self._migrate_legacy_files()
+        if not os.path.exists(self.usage_path):
+            self._rebuild_usage()
+        self._sync_search_index()
+
+    def _migrate_legacy_files(self):
+        """نقل الملفات المحفوظة مباشرة في مجلدات الكليات (الصيغة السابقة) إلى مخزن المحتوى"""
+        for college_name in os.listdir(self.base_path):
+            college_path = os.path.join(self.base_path, college_name)
+            if not os.path.isdir(college_path):
+                continue
+            legacy = [
+                name for name in os.listdir(college_path)
+                if not name.startswith('.') and os.path.isfile(os.path.join(college_path, name))
+            ]
+            if not legacy:
+                continue
+            with self.blobs.lock():
+                manifest = self._read_manifest(college_name)
+                usage = self._read_usage()
+                added, removed = [], []
+                for name in legacy:
+                    file_path = os.path.join(college_path, name)
+                    digest = hashlib.sha256()
+                    with open(file_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                            digest.update(chunk)
+                    digest = digest.hexdigest()
+                    old = manifest.get(name)
+                    stat = os.stat(file_path)
+                    self.blobs.commit(digest, file_path)
+                    manifest[name] = self._entry(
+                        name, digest, stat.st_size, None, None, stat.st_mtime, stat.st_mtime
+                    )
+                    added.append(digest)
+                    if old is not None:
+                        removed.append(old['sha256'])
+                    self._adjust_usage(usage, college_name, old, manifest[name])
+                self.blobs.update_refs(added=added, removed=removed)
+                self._write_manifest(college_name, manifest)
+                self._write_usage(usage)
+
+    def _read_usage(self):
+        try:
+            with open(self.usage_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_usage(self, usage):
+        atomic_write_json(self.usage_path, usage)
+
+    @staticmethod
+    def _adjust_usage(usage, college_name, old_entry, new_entry):
+        """تعديل عدادات الكلية باستبدال مدخل بيان بآخر (أي منهما قد يكون None)"""
+        counters = usage.setdefault(college_name, {'files': 0, 'bytes': 0})
+        if old_entry is not None:
+            counters['files'] -= 1
+            counters['bytes'] -= old_entry['size']
+        if new_entry is not None:
+            counters['files'] += 1
+            counters['bytes'] += new_entry['size']
+        if counters['files'] <= 0:
+            del usage[college_name]
+
+    def _rebuild_usage(self):
+        """حساب العدادات من بيانات الكليات (مرة واحدة عند عدم وجود ملف العدادات)"""
+        with self.blobs.lock():
+            usage = {}
+            for college_name in os.listdir(self.base_path):
+                if not os.path.isdir(os.path.join(self.base_path, college_name)):
+                    continue
+                for entry in self._read_manifest(college_name).values():
+                    self._adjust_usage(usage, college_name, None, entry)
+            self._write_usage(usage)
+
+    def _check_quota(self, usage, college_name, size, old_entry):
+        if not self.quota_bytes:
+            return
+        used = usage.get(college_name, {}).get('bytes', 0)
+        if old_entry is not None:
+            used -= old_entry['size']
+        if used + size > self.quota_bytes:
+            raise QuotaExceededError(college_name, used, self.quota_bytes)
+
+    def _sync_search_index(self):
+        """
+        مطابقة فهرس البحث مع بيانات الكليات: فهرسة الملفات الجديدة أو المتغيرة
+        وحذف الملفات غير الموجودة، ليتعافى الفهرس من أي تحديث فائت
+        """
+        indexed = self.search_index.indexed()
+        for college_name in os.listdir(self.base_path):
+            if not os.path.isdir(os.path.join(self.base_path, college_name)):
+                continue
+            for filename, entry in self._read_manifest(college_name).items():
+                if indexed.pop((college_name, filename), None) != entry['sha256']:
+                    self.jobs.submit('index', college_name, filename, entry['sha256'])
+        for college_name, filename in indexed:
+            self.search_index.remove_file(college_name, filename)
+
+    def _register_jobs(self, queue):
+        queue.register('index', self._index_job)
+
+    def _index_job(self, job, progress):
+        """مهمة خلفية: استخراج نص الملف في مجموعة العمليات ثم إضافته إلى فهرس البحث"""
+        college_name, filename, digest = job['college'], job['filename'], job['sha256']
+        if not self._is_current(college_name, filename, digest):
+            return
+        blob_path = self.blobs.locate(digest)
+        if blob_path is None:
+            raise FileNotFoundError(filename)
+        progress(0.1)
+        self.search_index.index_file(
+            college_name, filename, digest, blob_path,
+            extract=lambda path, name: self.jobs.run_cpu(
+                extract_normalized, os.path.abspath(path), name
+            )
+        )
+        progress(0.9)
+        # الملف حُذف أو استُبدل أثناء الاستخراج
+        if not self._is_current(college_name, filename, digest):
+            self.search_index.remove_file(college_name, filename, digest)
+
+    def _is_current(self, college_name, filename, digest):
+        entry = self._read_manifest(college_name).get(filename)
+        return entry is not None and entry['sha256'] == digest
+
+    def _manifest_path(self, college_name):
+        return os.path.join(self.base_path, college_name, '.manifest.json')
+
+    def _entry(self, filename, digest, size, mime, uploader, uploaded_at, mtime):
+        """مدخل البيان لمحتوى محفوظ في المخزن (يُستدعى بعد commit)"""
+        blob_path = self.blobs.locate(digest)
+        return {
+            'sha256': digest,
+            'size': size,
+            'stored_size': os.path.getsize(blob_path),
+            'codec': codec_of(blob_path),
+            'mime': mime or mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'uploader': uploader,
+            'uploaded_at': uploaded_at,
+            'mtime': mtime,
+        }
 
-    def save_file(self, uploaded_file, college_name):
-        college_path = os.path.join(self.base_path, college_name)
-        if not os.path.exists(college_path):
-            os.makedirs(college_path)
-            
+    def _read_manifest(self, college_name):
+        """
+        قراءة بيان الكلية مع تخزينه مؤقتاً في العملية ما دام الملف لم يتغير.
+        يُعيد نسخة سطحية يمكن للمستدعي تعديلها (باستبدال المدخلات لا تغييرها).
+        """
+        path = self._manifest_path(college_name)
         try:
-            file_path = os.path.join(college_path, uploaded_file.name)
-            with open(file_path, 'wb') as f:
-                f.write(uploaded_file.getvalue())
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {}
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = _manifest_cache.get(path)
+        if cached is None or cached[0] != key:
+            with open(path, 'r', encoding='utf-8') as f:
+                cached = (key, json.load(f))
+            _manifest_cache[path] = cached
+        return dict(cached[1])
+
+    def _write_manifest(self, college_name, manifest):
+        os.makedirs(os.path.join(self.base_path, college_name), exist_ok=True)
+        atomic_write_json(self._manifest_path(college_name), manifest)
+
+    def resolve_path(self, college_name, filename):
+        """
+        (مسار محتوى الملف في مخزن المحتوى، حجمه الأصلي)، أو None إذا لم يكن
+        الملف موجوداً. المسار قد يكون لملف مضغوط يُقرأ بـ open_blob.
+        """
+        entry = self._read_manifest(college_name).get(filename)
+        blob_path = self.blobs.locate(entry['sha256']) if entry else None
+        return (blob_path, entry['size']) if blob_path else None
+
+    def _codec_for(self, filename):
+        if not self.compression:
+            return None
+        return self.COMPRESSION.get(os.path.splitext(filename)[1].lower())
+
+    def save_file(self, uploaded_file, college_name, uploader=None):
+        """
+        حفظ الملف المرفوع على أجزاء في مخزن المحتوى مع حساب بصمته، ثم تسجيله
+        في بيان الكلية. المحتوى المكرر لا يُكتب مرة ثانية. المعالجة اللاحقة
+        (POST_PROCESSING) تُضاف إلى طابور المهام الخلفية ولا يُنتظر انتهاؤها.
+        uploader اسم المستخدم الذي رفع الملف ويُحفظ في بيانات الملف.
+        يُعيد بصمة SHA-256 للمحتوى، أو None عند الفشل.
+        """
+        [(_, digest, error)] = self.save_files([uploaded_file], college_name, uploader)
+        if error:
+            st.error(error)
+        return digest
+
+    def save_files(self, uploaded_files, college_name, uploader=None, on_progress=None):
+        """
+        حفظ عدة ملفات مرفوعة: تُنسخ إلى المخزن بالتوازي في مجموعة خيوط الرفع،
+        ثم تُسجل كلها في بيان الكلية والعدادات بكتابة واحدة تحت القفل.
+        on_progress(عدد المنتهي، العدد الكلي، اسم الملف، رسالة الخطأ أو None)
+        تُستدعى من الخيط المستدعي بعد نسخ كل ملف.
+        يُعيد لكل ملف بالترتيب (اسم الملف، البصمة أو None، رسالة الخطأ أو None).
+        """
+        names = [os.path.basename(f.name) for f in uploaded_files]
+        errors = {}
+        staged = {}
+        try:
+            # فحص الحصة بالأحجام المعلنة قبل كتابة أي بايت، ثم بالأحجام الفعلية تحت القفل
+            usage = self._read_usage()
+            manifest = self._read_manifest(college_name)
+            accepted = []
+            for i, uploaded_file in enumerate(uploaded_files):
+                upload_size = getattr(uploaded_file, 'size', None)
+                try:
+                    if upload_size is not None:
+                        self._check_quota(usage, college_name, upload_size, manifest.get(names[i]))
+                        self._adjust_usage(
+                            usage, college_name, manifest.get(names[i]), {'size': upload_size}
+                        )
+                        manifest[names[i]] = {'size': upload_size}
+                    accepted.append(i)
+                except QuotaExceededError as e:
+                    errors[i] = str(e)
+
+            futures = {
+                _upload_pool.submit(self._stage_upload, uploaded_files[i], names[i]): i
+                for i in accepted
+            }
+            done = len(errors)
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    staged[i] = future.result()
+                except Exception as e:
+                    errors[i] = f"خطأ في حفظ الملف: {str(e)}"
+                done += 1
+                if on_progress is not None:
+                    on_progress(done, len(uploaded_files), names[i], errors.get(i))
+
+            digests = {}
+            if staged:
+                try:
+                    digests = self._commit_uploads(college_name, staged, names, uploaded_files, uploader)
+                except Exception as e:
+                    for i in staged:
+                        errors[i] = f"خطأ في حفظ الملف: {str(e)}"
+            for i, digest in digests.items():
+                if isinstance(digest, QuotaExceededError):
+                    errors[i] = str(digest)
+                    continue
+                for kind in self.POST_PROCESSING:
+                    self.jobs.submit(kind, college_name, names[i], digest)
+        finally:
+            for digest, size, tmp_path, codec in staged.values():
+                if tmp_path is not None:
+                    self.blobs.discard(tmp_path)
+        return [
+            (name, None if i in errors else digests.get(i), errors.get(i))
+            for i, name in enumerate(names)
+        ]
+
+    def _stage_upload(self, uploaded_file, filename):
+        """نسخ ملف مرفوع إلى ملف مؤقت في المخزن (يُنفذ في خيوط الرفع)"""
+        uploaded_file.seek(0)
+        return list(self.blobs.stage(uploaded_file, self._codec_for(filename)))
+
+    def _commit_uploads(self, college_name, staged, names, uploaded_files, uploader):
+        """
+        تسجيل الملفات المنسوخة في المخزن وبيان الكلية والعدادات تحت قفل واحد.
+        يُعيد {رقم الملف: البصمة أو QuotaExceededError}، ويُفرغ مسار الملف
+        المؤقت في staged لكل ملف نُقل إلى المخزن.
+        """
+        results = {}
+        with self.blobs.lock():
+            manifest = self._read_manifest(college_name)
+            usage = self._read_usage()
+            added, removed = [], []
+            now = time.time()
+            for i in sorted(staged):
+                item = staged[i]
+                digest, size, tmp_path, codec = item
+                filename = names[i]
+                old = manifest.get(filename)
+                try:
+                    self._check_quota(usage, college_name, size, old)
+                except QuotaExceededError as e:
+                    results[i] = e
+                    continue
+                self.blobs.commit(digest, tmp_path, codec)
+                item[2] = None
+                manifest[filename] = self._entry(
+                    filename, digest, size, getattr(uploaded_files[i], 'type', None), uploader,
+                    old['uploaded_at'] if old and old.get('uploaded_at') else now, now
+                )
+                self._adjust_usage(usage, college_name, old, manifest[filename])
+                added.append(digest)
+                if old is not None:
+                    removed.append(old['sha256'])
+                results[i] = digest
+            # زيادة المراجع الجديدة قبل كتابة البيان وإنقاص القديمة بعدها،
+            # فالانقطاع بينهما قد يترك محتوى زائداً لكن لا يترك ملفاً بلا محتوى
+            self.blobs.update_refs(added=added)
+            self._write_manifest(college_name, manifest)
+            self._write_usage(usage)
+            self.blobs.update_refs(removed=removed)
+        return results
+
+    def delete_file(self, filename, college_name):
+        try:
+            with self.blobs.lock():
+                manifest = self._read_manifest(college_name)
+                entry = manifest.pop(filename, None)
+                if entry is None:
+                    return False
+                self._write_manifest(college_name, manifest)
+                usage = self._read_usage()
+                self._adjust_usage(usage, college_name, entry, None)
+                self._write_usage(usage)
+                self.blobs.update_refs(removed=[entry['sha256']])
+                self.search_index.remove_file(college_name, filename)
+            return True
         except Exception as e:
-            st.error(f"خطأ في حفظ الملف: {str(e)}")
+            st.error(f"خطأ في حذف الملف: {str(e)}")
+            return False
 
     def get_files(self, college_name):
-        college_path = os.path.join(self.base_path, college_name)
-        if not os.path.exists(college_path):
-            return []
         try:
-            return os.listdir(college_path)
+            return list(self._read_manifest(college_name))
         except Exception as e:
             st.error(f"خطأ في قراءة الملفات: {str(e)}")
             return []
 
+    def search_files(self, query, college_name=None, limit=50):
+        """البحث في أسماء الملفات ونصوصها في كل الكليات أو في كلية واحدة"""
+        try:
+            return self.search_index.search(query, college_name, limit)
+        except Exception as e:
+            st.error(f"خطأ في البحث: {str(e)}")
+            return []
+
+    def get_usage(self):
+        """عدادات الاستخدام لكل كلية: {الكلية: {'files': العدد، 'bytes': مجموع الأحجام}}"""
+        try:
+            return self._read_usage()
+        except Exception as e:
+            st.error(f"خطأ في قراءة مساحة التخزين: {str(e)}")
+            return {}
+
+    def get_jobs(self, college_name=None, active_only=False):
+        """مهام المعالجة الخلفية مع حالتها ونسبة تقدمها"""
+        try:
+            return self.jobs.jobs(college_name, active_only)
+        except Exception as e:
+            st.error(f"خطأ في قراءة المهام: {str(e)}")
+            return []
+
+    def get_file_info(self, college_name, filename):
+        entry = self._read_manifest(college_name).get(filename)
+        return dict(entry, name=filename) if entry else None
+
+    def list_files(self, college_name, query='', sort_by='name', descending=False,
+                   offset=0, limit=None):
+        """
+        قائمة بيانات ملفات الكلية مرتبة حسب sort_by (أحد SORT_FIELDS) ومصفاة
+        بالنص query في الاسم، ثم مقتطعة من offset بطول limit.
+        يُعيد (مدخلات الصفحة، العدد الكلي بعد التصفية).
+        """
+        try:
+            manifest = self._read_manifest(college_name)
+        except Exception as e:
+            st.error(f"خطأ في قراءة الملفات: {str(e)}")
+            return [], 0
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"حقل ترتيب غير مدعوم: {sort_by}")
+        names = manifest.keys()
+        if query:
+            needle = query.casefold()
+            names = [name for name in names if needle in name.casefold()]
+        if sort_by == 'name':
+            names = sorted(names, reverse=descending)
+        else:
+            names = sorted(
+                names, key=lambda name: (manifest[name].get(sort_by) or 0, name),
+                reverse=descending
+            )
+        total = len(names)
+        end = None if limit is None else offset + limit
+        return [dict(manifest[name], name=name) for name in names[offset:end]], total
+
     def download_file(self, filename, college_name):
+        """
+        عرض طريقة تحميل الملف: زر تحميل Streamlit للملفات حتى INLINE_DOWNLOAD_LIMIT،
+        ورابط إلى خادم التنزيل المحلي (file_server) للملفات الأكبر حتى تُرسل من
+        القرص مباشرة دون تحميلها في الذاكرة أو عبر اتصال websocket. إذا لم يُحدد
+        عنوان عام للخادم (FILE_SERVER_URL) لا تُعرض الملفات الأكبر للتحميل.
+        """
         try:
-            file_path = os.path.join(self.base_path, college_name, filename)
-            with open(file_path, 'rb') as f:
-                bytes_data = f.read()
-                b64 = base64.b64encode(bytes_data).decode()
-                href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">اضغط هنا للتحميل</a>'
-                st.markdown(href, unsafe_allow_html=True)
+            content = self.resolve_path(college_name, filename)
+            if content is None:
+                raise FileNotFoundError(filename)
+            file_path, size = content
+            if size <= self.INLINE_DOWNLOAD_LIMIT:
+                with open_blob(file_path) as f:
+                    # زر التحميل يقبل ملفاً عادياً أو بايتات فقط؛ المحتوى المضغوط
+                    # يُفك على أجزاء بحد أقصى INLINE_DOWNLOAD_LIMIT
+                    data = f if codec_of(file_path) is None else self._read_limited(f)
+                    st.download_button(
+                        "اضغط هنا للتحميل", data, file_name=filename,
+                        mime='application/octet-stream',
+                        key=f"download_button_{college_name}_{filename}"
+                    )
+                return
+            if not file_server.is_configured():
+                st.warning(
+                    f"حجم الملف ({format_size(size)}) أكبر من حد التحميل المباشر "
+                    f"({format_size(self.INLINE_DOWNLOAD_LIMIT)}). تحميل الملفات الكبيرة يحتاج إلى "
+                    "ضبط خادم التنزيل (FILE_SERVER_URL)؛ يرجى مراجعة مسؤول النظام."
+                )
+                return
+            url = file_server.download_url(
+                self.resolve_path, college_name, filename,
+                public_host=st.context.headers.get('Host'), build_archive=self.export_archive
+            )
+            st.markdown(f'<a href="{html.escape(url)}" download>اضغط هنا للتحميل</a>', unsafe_allow_html=True)
         except Exception as e:
             st.error(f"خطأ في تحميل الملف: {str(e)}")
+
+    def _read_limited(self, f):
+        """قراءة محتوى مفكوك على أجزاء، مع رفض ما يتجاوز INLINE_DOWNLOAD_LIMIT"""
+        data = bytearray()
+        for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+            data += chunk
+            if len(data) > self.INLINE_DOWNLOAD_LIMIT:
+                raise ValueError("حجم المحتوى أكبر من حد التحميل المباشر")
+        return bytes(data)
+
+    def export_archive(self, college_name, filenames=None):
+        """
+        أرشيف ZIP لملفات الكلية (كلها، أو الموجود منها في filenames) يُولّد
+        أجزاءً متتالية من البايتات أثناء القراءة، فلا يُبنى الأرشيف في الذاكرة
+        ولا على القرص مهما كان حجمه. الملفات المضغوطة أصلاً تُخزن دون ضغط.
+        """
+        manifest = self._read_manifest(college_name)
+        names = list(manifest) if filenames is None else [n for n in filenames if n in manifest]
+        sink = _ChunkSink()
+        with zipfile.ZipFile(sink, 'w') as archive:
+            for name in names:
+                entry = manifest[name]
+                blob_path = self.blobs.locate(entry['sha256'])
+                if blob_path is None:
+                    continue
+                info = zipfile.ZipInfo(name, date_time=time.localtime(entry['mtime'])[:6])
+                if os.path.splitext(name)[1].lower() in self.ARCHIVE_STORED:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                info.file_size = entry['size']
+                with open_blob(blob_path) as source, archive.open(info, 'w') as target:
+                    for chunk in iter(lambda: source.read(self.CHUNK_SIZE), b''):
+                        target.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+        yield sink.drain()
+
+    def archive_link(self, college_name, filenames=None):
+        """
+        عرض طريقة تنزيل أرشيف ZIP لملفات الكلية: زر تحميل Streamlit للأرشيفات
+        حتى INLINE_DOWNLOAD_LIMIT، ورابط إلى خادم التنزيل المحلي للأرشيفات
+        الأكبر. إذا لم يُحدد عنوان عام للخادم (FILE_SERVER_URL) لا يُنشأ الأرشيف
+        الأكبر في الذاكرة وتُعرض رسالة بذلك.
+        """
+        try:
+            manifest = self._read_manifest(college_name)
+            names = manifest if filenames is None else [n for n in filenames if n in manifest]
+            size = sum(manifest[name]['size'] for name in names)
+            if size <= self.INLINE_DOWNLOAD_LIMIT:
+                st.download_button(
+                    "اضغط هنا لتنزيل الأرشيف", b''.join(self.export_archive(college_name, filenames)),
+                    file_name=f"{college_name}.zip", mime='application/zip',
+                    key=f"archive_button_{college_name}"
+                )
+                return
+            if not file_server.is_configured():
+                st.warning(
+                    f"حجم الملفات ({format_size(size)}) أكبر من حد التحميل المباشر "
+                    f"({format_size(self.INLINE_DOWNLOAD_LIMIT)}). تنزيل الأرشيفات الكبيرة يحتاج إلى "
+                    "ضبط خادم التنزيل (FILE_SERVER_URL)؛ يرجى مراجعة مسؤول النظام."
+                )
+                return
+            url = file_server.archive_url(
+                self.resolve_path, self.export_archive, college_name, filenames,
+                public_host=st.context.headers.get('Host')
+            )
+            st.markdown(f'<a href="{html.escape(url)}" download>اضغط هنا لتنزيل الأرشيف</a>', unsafe_allow_html=True)
+        except Exception as e:
+            st.error(f"خطأ في تصدير الملفات: {str(e)}")
@@ -0,0 +1,240 @@
+"""
+فهرس بحث نصي كامل في محتوى ملفات الكليات (pdf و docx و txt).
+
+يُستخرج نص كل ملف عند حفظه ويُطبّع (حذف التشكيل والتطويل وتوحيد صور
+الألف والياء والتاء المربوطة) ثم يُضاف إلى جدول FTS5 في SQLite، فيتم
+البحث في كل الكليات عبر الفهرس المعكوس دون فتح الملفات.
+
+استخراج نص PDF يحتاج إلى مكتبة pypdf إن كانت مثبتة، وإلا تُفهرس ملفات
+PDF بأسمائها فقط. ملفات DOCX تُقرأ بالمكتبة القياسية (zipfile).
+"""
+import os
+import re
+import sqlite3
+import threading
+import zipfile
+from xml.etree import ElementTree
+
+from blob_store import open_blob
+from college_store import Transaction
+
+# أقصى عدد من الأحرف يُفهرس من كل ملف
+MAX_TEXT_CHARS = 2_000_000
+
+_DIACRITICS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_FOLD = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+})
+_WORD = re.compile(r'\w+')
+# صور أداة التعريف مع حروف العطف والجر المتصلة، الأطول أولاً
+_ARTICLES = ('وال', 'بال', 'كال', 'فال', 'ال', 'لل')
+_DOCX_TEXT = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'
+_DOCX_PARAGRAPH = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'
+
+
+def normalize_arabic(text):
+    """تطبيع النص للبحث: حذف التشكيل والتطويل وتوحيد الحروف المتشابهة"""
+    return _DIACRITICS.sub('', text).translate(_FOLD).casefold()
+
+
+def _extract_txt(path):
+    with open_blob(path) as f:
+        data = f.read(MAX_TEXT_CHARS * 4)
+    for encoding in ('utf-8-sig', 'cp1256'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def _extract_docx(path):
+    parts = []
+    with open_blob(path) as f, zipfile.ZipFile(f) as archive:
+        with archive.open('word/document.xml') as document:
+            for _, element in ElementTree.iterparse(document):
+                if element.tag == _DOCX_TEXT and element.text:
+                    parts.append(element.text)
+                elif element.tag == _DOCX_PARAGRAPH:
+                    parts.append('\n')
+                    element.clear()
+    return ''.join(parts)
+
+
+def _extract_pdf(path):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return ''
+    parts = []
+    length = 0
+    with open_blob(path) as f:
+        for page in PdfReader(f).pages:
+            text = page.extract_text() or ''
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_TEXT_CHARS:
+                break
+    return '\n'.join(parts)
+
+
+_EXTRACTORS = {
+    '.txt': _extract_txt,
+    '.docx': _extract_docx,
+    '.pdf': _extract_pdf,
+}
+
+
+def extract_text(path, filename):
+    """
+    استخراج نص الملف حسب امتداد اسمه (لا امتداد ملف المحتوى المخزن، الذي
+    قد يكون مضغوطاً)، أو نص فارغ للأنواع غير المدعومة
+    """
+    extractor = _EXTRACTORS.get(os.path.splitext(filename)[1].lower())
+    if extractor is None:
+        return ''
+    return extractor(path)[:MAX_TEXT_CHARS]
+
+
+def extract_normalized(path, filename):
+    """النص المستخرج بعد التطبيع، بالصيغة المخزنة في الفهرس"""
+    return normalize_arabic(extract_text(path, filename))
+
+
+def _word_terms(word):
+    """
+    صيغ الكلمة المطابقة في الفهرس: الكلمة دون أداة التعريف ومع كل صورها
+    (ال، وال، بال...)، فالبحث عن «اجانب» يجد «الاجانب» والعكس
+    """
+    stem = word
+    for prefix in _ARTICLES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            stem = word[len(prefix):]
+            break
+    terms = [stem] + [prefix + stem for prefix in _ARTICLES]
+    return '(' + ' OR '.join(f'"{term}"*' for term in terms) + ')'
+
+
+def _match_query(query):
+    """تحويل نص البحث إلى استعلام FTS5: كل كلمة مطبّعة بادئةً، والكلمات مجتمعة"""
+    words = _WORD.findall(normalize_arabic(query))
+    return ' AND '.join(_word_terms(word) for word in words)
+
+
+class SearchIndex:
+    """
+    فهرس FTS5 للملفات: جدول files يربط (الكلية، اسم الملف) ببصمة المحتوى،
+    وجدول documents يحوي النص المطبّع بنفس rowid. التحديث تدريجي لكل ملف،
+    والنص المستخرج يُعاد استخدامه للملفات التي تشترك في البصمة نفسها.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY,
+            college TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            UNIQUE (college, filename)
+        );
+        CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
+        CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+            filename, content, tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """
+
+    def __init__(self, db_path='data/search.db'):
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self.SCHEMA)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def indexed(self):
+        """البصمات المفهرسة: {(الكلية، اسم الملف): البصمة}"""
+        rows = self._connection().execute("SELECT college, filename, sha256 FROM files")
+        return {(college, filename): digest for college, filename, digest in rows}
+
+    def index_file(self, college_name, filename, digest, path, extract=extract_normalized):
+        """
+        إضافة ملف إلى الفهرس أو تحديثه. لا يُستخرج النص إذا كان الملف مفهرساً
+        بالبصمة نفسها أو كان محتواه مفهرساً تحت اسم آخر. extract(path, filename)
+        تُعيد النص المطبّع، ويمكن استبدالها لتنفيذ الاستخراج في عملية أخرى.
+        """
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT sha256 FROM files WHERE college = ? AND filename = ?",
+            (college_name, filename)
+        ).fetchone()
+        if row is not None and row[0] == digest:
+            return
+        shared = conn.execute(
+            "SELECT d.content FROM files f JOIN documents d ON d.rowid = f.id "
+            "WHERE f.sha256 = ? LIMIT 1",
+            (digest,)
+        ).fetchone()
+        content = shared[0] if shared else extract(path, filename)
+        with Transaction(conn, "IMMEDIATE"):
+            self._remove(conn, college_name, filename)
+            cursor = conn.execute(
+                "INSERT INTO files (college, filename, sha256) VALUES (?, ?, ?)",
+                (college_name, filename, digest)
+            )
+            conn.execute(
+                "INSERT INTO documents (rowid, filename, content) VALUES (?, ?, ?)",
+                (cursor.lastrowid, normalize_arabic(filename), content)
+            )
+
+    @staticmethod
+    def _remove(conn, college_name, filename, digest=None):
+        sql = "SELECT id FROM files WHERE college = ? AND filename = ?"
+        params = [college_name, filename]
+        if digest is not None:
+            sql += " AND sha256 = ?"
+            params.append(digest)
+        row = conn.execute(sql, params).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM documents WHERE rowid = ?", row)
+            conn.execute("DELETE FROM files WHERE id = ?", row)
+
+    def remove_file(self, college_name, filename, digest=None):
+        """حذف الملف من الفهرس، أو حذفه فقط إذا كان مفهرساً بالبصمة digest"""
+        conn = self._connection()
+        with Transaction(conn, "IMMEDIATE"):
+            self._remove(conn, college_name, filename, digest)
+
+    def search(self, query, college_name=None, limit=50):
+        """
+        البحث في أسماء الملفات ومحتواها مرتبة حسب الصلة (bm25).
+        يُعيد قائمة قواميس فيها college و filename و snippet.
+        """
+        match = _match_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT f.college, f.filename, "
+            "snippet(documents, 1, '[', ']', '…', 12) "
+            "FROM documents JOIN files f ON f.id = documents.rowid "
+            "WHERE documents MATCH ?"
+        )
+        params = [match]
+        if college_name is not None:
+            sql += " AND f.college = ?"
+            params.append(college_name)
+        sql += " ORDER BY bm25(documents) LIMIT ?"
+        params.append(limit)
+        return [
+            {'college': college, 'filename': filename, 'snippet': snippet}
+            for college, filename, snippet in self._connection().execute(sql, params)
+        ]
@@ -0,0 +1,252 @@
+"""
+خادم HTTP محلي صغير لتنزيل الملفات الكبيرة مباشرة من القرص.
+
+يعمل في خيط خلفي داخل عملية Streamlit، ويخدم الملفات عبر روابط موقعة
+(HMAC) وصالحة لمدة محدودة فقط، مع دعم طلبات Range (استكمال التنزيل)
+و ETag، ويرسل المحتوى بـ sendfile دون تحميله في الذاكرة. الملفات المخزنة
+مضغوطة تُفك أثناء الإرسال على أجزاء. المسار /archive يرسل ملفات كلية
+(كلها أو المحدد منها) كأرشيف ZIP يُبنى أثناء الإرسال.
+
+الإعدادات عبر المتغيرات البيئية:
+- FILE_SERVER_HOST و FILE_SERVER_PORT: عنوان الاستماع (127.0.0.1:8502 افتراضياً)
+- FILE_SERVER_URL: العنوان العام الذي يصل منه المتصفح إلى الخادم عبر وكيل
+  عكسي (مثلاً https://example.org/files يُوجَّه إلى 127.0.0.1:8502). الخادم
+  لا يُستخدم ما لم يُحدد هذا المتغير (انظر is_configured)، لأن منفذه غير
+  مكشوف في النشر الافتراضي، والروابط بـ http من صفحة https يحجبها المتصفح.
+"""
+import hashlib
+import hmac
+import os
+import re
+import threading
+import time
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+
+from blob_store import codec_of, open_blob
+
+CHUNK_SIZE = 1024 * 1024
+_SECRET = os.urandom(32)
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def _sign(kind, college_name, filenames, expires):
+    message = '\0'.join([kind, college_name, *filenames, str(expires)]).encode('utf-8')
+    return hmac.new(_SECRET, message, hashlib.sha256).hexdigest()
+
+
+def etag_for(stat):
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+class _DownloadHandler(BaseHTTPRequestHandler):
+    # دالة تعيد (مسار محتوى الملف على القرص، حجمه الأصلي) من (اسم الكلية، اسم الملف) أو None
+    resolve_path = None
+    # دالة تعيد أجزاء أرشيف ZIP من (اسم الكلية، أسماء الملفات أو None للكل)
+    build_archive = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._dispatch(send_body=False)
+
+    def do_GET(self):
+        self._dispatch(send_body=True)
+
+    def _dispatch(self, send_body):
+        kind = urlparse(self.path).path.strip('/')
+        verified = self._verify(kind)
+        if verified is None:
+            self.send_error(HTTPStatus.FORBIDDEN)
+            return
+        college_name, filenames = verified
+        if kind == 'archive' and self.build_archive is not None:
+            self._serve_archive(college_name, filenames or None, send_body)
+        elif kind == 'download' and len(filenames) == 1:
+            self._serve(college_name, filenames[0], send_body)
+        else:
+            self.send_error(HTTPStatus.NOT_FOUND)
+
+    def _verify(self, kind):
+        """(اسم الكلية، أسماء الملفات) من رابط موقع وصالح، أو None"""
+        query = parse_qs(urlparse(self.path).query)
+        try:
+            college_name = query['c'][0]
+            filenames = query.get('f', [])
+            expires = int(query['e'][0])
+            signature = query['s'][0]
+        except (KeyError, IndexError, ValueError):
+            return None
+        if expires < time.time():
+            return None
+        if not hmac.compare_digest(signature, _sign(kind, college_name, filenames, expires)):
+            return None
+        return college_name, filenames
+
+    def _serve_archive(self, college_name, filenames, send_body):
+        """إرسال الأرشيف دون Content-Length؛ نهاية الاتصال تحدد نهاية الملف"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'application/zip')
+        self.send_header(
+            'Content-Disposition', f"attachment; filename*=UTF-8''{quote(college_name)}.zip"
+        )
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            for chunk in self.build_archive(college_name, filenames):
+                if chunk:
+                    self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _serve(self, college_name, filename, send_body):
+        content = self.resolve_path(college_name, filename)
+        try:
+            if content is None:
+                raise FileNotFoundError(filename)
+            file_path, size = content
+            compressed = codec_of(file_path) is not None
+            f = open_blob(file_path)
+        except (FileNotFoundError, IsADirectoryError):
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        with f:
+            stat = os.stat(file_path)
+            etag = etag_for(stat)
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+
+            start, end = 0, size - 1
+            status = HTTPStatus.OK
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if range_header and (if_range is None or if_range == etag):
+                match = _RANGE.match(range_header.strip())
+                if match is None or match.groups() == ('', ''):
+                    self._send_unsatisfiable(size)
+                    return
+                first, last = match.groups()
+                if first:
+                    start = int(first)
+                    end = min(int(last), size - 1) if last else size - 1
+                else:
+                    start = max(size - int(last), 0)
+                if start >= size or start > end:
+                    self._send_unsatisfiable(size)
+                    return
+                status = HTTPStatus.PARTIAL_CONTENT
+
+            length = end - start + 1 if size else 0
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(stat.st_mtime, usegmt=True))
+            self.send_header(
+                'Content-Disposition', f"attachment; filename*=UTF-8''{quote(filename)}"
+            )
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.end_headers()
+            if send_body and length:
+                if compressed:
+                    self._send_stream(f, start, length)
+                else:
+                    self._send_file(f, start, length)
+
+    def _send_unsatisfiable(self, size):
+        self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.send_header('Content-Range', f'bytes */{size}')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_file(self, f, offset, count):
+        try:
+            self.connection.sendfile(f, offset, count)
+        except (BrokenPipeError, ConnectionResetError):
+            # أغلق المتصفح الاتصال (إلغاء التنزيل)
+            pass
+
+    def _send_stream(self, f, offset, count):
+        """إرسال محتوى مضغوط بعد فكه على أجزاء؛ التقدم إلى offset يتم بالقراءة"""
+        try:
+            f.seek(offset)
+            while count > 0:
+                chunk = f.read(min(CHUNK_SIZE, count))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                count -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def is_configured():
+    """هل للخادم عنوان عام (FILE_SERVER_URL) يصل إليه المتصفح"""
+    return bool(os.environ.get('FILE_SERVER_URL'))
+
+
+def ensure_server(resolve_path, build_archive=None):
+    """
+    تشغيل الخادم مرة واحدة لكل عملية وإعادته. resolve_path تحوّل
+    (اسم الكلية، اسم الملف) إلى (مسار المحتوى على القرص، الحجم الأصلي) أو None،
+    و build_archive تعيد أجزاء أرشيف ZIP لملفات الكلية.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            host = os.environ.get('FILE_SERVER_HOST', '127.0.0.1')
+            port = int(os.environ.get('FILE_SERVER_PORT', '8502'))
+            handler = type('DownloadHandler', (_DownloadHandler,), {
+                'resolve_path': staticmethod(resolve_path),
+                'build_archive': staticmethod(build_archive) if build_archive else None,
+            })
+            server = ThreadingHTTPServer((host, port), handler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            _server = server
+        return _server
+
+
+def _signed_url(server, kind, college_name, filenames, public_host, ttl):
+    base_url = os.environ.get('FILE_SERVER_URL')
+    if not base_url:
+        host = (public_host or 'localhost').rsplit(':', 1)[0]
+        base_url = f"http://{host}:{server.server_address[1]}"
+    expires = int(time.time()) + ttl
+    query = urlencode({
+        'c': college_name,
+        'f': filenames,
+        'e': expires,
+        's': _sign(kind, college_name, filenames, expires),
+    }, doseq=True)
+    return f"{base_url.rstrip('/')}/{kind}?{query}"
+
+
+def download_url(resolve_path, college_name, filename, public_host=None, ttl=3600,
+                 build_archive=None):
+    """
+    رابط تنزيل موقع وصالح لمدة ttl ثانية. public_host هو اسم المضيف الذي
+    يستخدمه المتصفح للوصول إلى التطبيق، ويُستخدم ما لم يُحدد FILE_SERVER_URL.
+    """
+    server = ensure_server(resolve_path, build_archive)
+    return _signed_url(server, 'download', college_name, [filename], public_host, ttl)
+
+
+def archive_url(resolve_path, build_archive, college_name, filenames=None, public_host=None,
+                ttl=3600):
+    """رابط موقع لأرشيف ZIP لملفات الكلية المحددة، أو لكل ملفاتها إذا كانت filenames فارغة"""
+    server = ensure_server(resolve_path, build_archive)
+    return _signed_url(server, 'archive', college_name, list(filenames or []), public_host, ttl)
@@ -0,0 +1,204 @@
+"""
+قياس زمن العمليات داخل العملية: عدد الاستدعاءات ومدرج تكراري للزمن لكل
+عملية، مع آخر العينات لحساب النسب المئوية (p50/p95/p99).
+
+الاستخدام:
+    @timed('to_excel')                  # مزخرف دالة
+    with timed('page.الإحصائيات'):       # مدير سياق
+    @instrumented('CollegeManager')     # مزخرف صنف لكل دواله العامة
+
+تُكتب المقاييس دورياً بصيغتي JSON و Prometheus النصية إلى ملفات محلية
+(data/metrics.json و data/metrics.prom) ليقرأها أي جامع مقاييس، وتُضبط
+المدة بالمتغير PERF_METRICS_EXPORT_INTERVAL بالثواني (0 يوقف الكتابة).
+"""
+import functools
+import inspect
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+
+# حدود فئات المدرج التكراري بالثواني (كما في مكتبات Prometheus)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# عدد آخر العينات المحفوظة لكل عملية لحساب النسب المئوية
+SAMPLE_SIZE = 2048
+METRIC_NAME = 'wasit_operation_seconds'
+
+
+class _Operation:
+    __slots__ = ('count', 'total', 'buckets', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        self.samples.append(seconds)
+
+
+_operations = {}
+_lock = threading.Lock()
+
+
+def observe(name, seconds):
+    with _lock:
+        operation = _operations.get(name)
+        if operation is None:
+            operation = _operations[name] = _Operation()
+        operation.observe(seconds)
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def snapshot():
+    """
+    حالة المقاييس الحالية: {العملية: {count, total_seconds, mean_seconds,
+    p50, p95, p99, buckets}}؛ النسب المئوية بالثواني من آخر العينات
+    """
+    with _lock:
+        copies = {
+            name: (op.count, op.total, list(op.buckets), sorted(op.samples))
+            for name, op in _operations.items()
+        }
+    result = {}
+    for name, (count, total, buckets, ordered) in sorted(copies.items()):
+        result[name] = {
+            'count': count,
+            'total_seconds': total,
+            'mean_seconds': total / count if count else None,
+            'p50': _percentile(ordered, 0.50),
+            'p95': _percentile(ordered, 0.95),
+            'p99': _percentile(ordered, 0.99),
+            'buckets': dict(zip([*map(str, BUCKETS), '+Inf'], buckets)),
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _operations.clear()
+
+
+def to_json(data=None):
+    return json.dumps(snapshot() if data is None else data, ensure_ascii=False, indent=2)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def to_prometheus(data=None):
+    """المقاييس بصيغة Prometheus النصية كمدرج تكراري لكل عملية"""
+    data = snapshot() if data is None else data
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of instrumented operations.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for name, stats in data.items():
+        label = f'operation="{_label(name)}"'
+        cumulative = 0
+        for bound, count in stats['buckets'].items():
+            cumulative += count
+            lines.append(f'{METRIC_NAME}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f"{METRIC_NAME}_sum{{{label}}} {stats['total_seconds']}")
+        lines.append(f"{METRIC_NAME}_count{{{label}}} {stats['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+class timed(ContextDecorator):
+    """قياس زمن كتلة أو دالة وتسجيله باسم العملية name، حتى عند حدوث استثناء"""
+
+    def __init__(self, name):
+        self.name = name
+        self._started = threading.local()
+
+    def __enter__(self):
+        stack = getattr(self._started, 'stack', None)
+        if stack is None:
+            stack = self._started.stack = []
+        stack.append(time.perf_counter())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self._started.stack.pop())
+        return False
+
+
+def instrumented(prefix):
+    """
+    مزخرف صنف يقيس كل دالة عامة فيه باسم prefix.اسم_الدالة. دوال
+    المولدات لا تُقاس لأن استدعاءها لا ينفذ شيئاً حتى يُقرأ الناتج.
+    """
+    def decorate(cls):
+        for name, func in list(vars(cls).items()):
+            if name.startswith('_') or not inspect.isfunction(func):
+                continue
+            if inspect.isgeneratorfunction(func):
+                continue
+            setattr(cls, name, functools.wraps(func)(timed(f"{prefix}.{name}")(func)))
+        return cls
+    return decorate
+
+
+def _atomic_write_text(path, text):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.metrics-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def export_files(json_path='data/metrics.json', prometheus_path='data/metrics.prom'):
+    data = snapshot()
+    _atomic_write_text(json_path, to_json(data))
+    _atomic_write_text(prometheus_path, to_prometheus(data))
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(json_path='data/metrics.json', prometheus_path='data/metrics.prom'):
+    """تشغيل خيط كتابة ملفات المقاييس مرة واحدة لكل عملية"""
+    global _exporter
+    interval = float(os.environ.get('PERF_METRICS_EXPORT_INTERVAL', '15'))
+    if interval <= 0:
+        return
+    with _exporter_lock:
+        if _exporter is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    export_files(json_path, prometheus_path)
+                except OSError:
+                    pass
+
+        _exporter = threading.Thread(target=run, name='perf-metrics-export', daemon=True)
+        _exporter.start()
@@ -0,0 +1,90 @@
+"""
+تقارير Excel تُنشأ عند الطلب فقط وتُحفظ على القرص حسب نوع التقرير وإصدار
+البيانات، فطلب التقرير نفسه مرة أخرى دون تعديل البيانات لا يعيد إنشاءه.
+
+الكتابة بـ xlsxwriter في وضع constant_memory صفاً بعد صف، فتبقى الذاكرة
+ثابتة مهما كان عدد الصفوف.
+"""
+import hashlib
+import math
+import os
+import tempfile
+
+import xlsxwriter
+
+from perf_metrics import instrumented, timed
+
+XLSX_MIME = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _cell(value):
+    """تحويل قيم numpy إلى أنواع Python، والقيم المفقودة إلى خلايا فارغة"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+@timed('write_excel')
+def write_excel(path, df, sheet_name='Sheet1'):
+    """كتابة DataFrame مع الفهرس في ملف xlsx صفاً بعد صف (كما في df.to_excel)"""
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet(sheet_name)
+        header = workbook.add_format({'bold': True, 'border': 1})
+        sheet.write_row(0, 0, [df.index.name or '', *map(str, df.columns)], header)
+        for row, values in enumerate(df.itertuples(name=None), start=1):
+            sheet.write_row(row, 0, [_cell(value) for value in values])
+    finally:
+        workbook.close()
+
+
+@instrumented('ReportCache')
+class ReportCache:
+    """
+    ذاكرة تقارير على القرص: ملف لكل (نوع التقرير، مفتاح البيانات)، ويُبقى
+    لكل نوع أحدث keep ملفات فقط.
+    """
+
+    def __init__(self, directory='data/reports', keep=4):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, report_type, cache_key):
+        digest = hashlib.sha256(repr(cache_key).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{report_type}-{digest}.xlsx")
+
+    def get(self, report_type, cache_key, build_frame, sheet_name='Sheet1'):
+        """
+        مسار ملف التقرير، ويُنشأ باستدعاء build_frame() فقط إذا لم يكن محفوظاً
+        لهذا المفتاح. cache_key يجب أن يتغير مع كل تعديل على البيانات.
+        """
+        path = self.path(report_type, cache_key)
+        if os.path.exists(path):
+            return path
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{report_type}-", suffix='.xlsx', dir=self.directory)
+        os.close(fd)
+        try:
+            write_excel(tmp_path, build_frame(), sheet_name)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._prune(report_type)
+        return path
+
+    def _prune(self, report_type):
+        prefix = f"{report_type}-"
+        reports = sorted(
+            (entry for entry in os.scandir(self.directory)
+             if entry.name.startswith(prefix) and entry.name.endswith('.xlsx')),
+            key=lambda entry: entry.stat().st_mtime, reverse=True
+        )
+        for entry in reports[self.keep:]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
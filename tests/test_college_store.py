@@ -0,0 +1,272 @@
+"""
+اختبارات مخزني الكليات: إعادة تطبيق السجل، والسطر الأخير المنقطع، ونوافذ
+انقطاع الدمج، وكشف التعديلات القديمة، والأقفال بين العمليات، وتطابق نتائج
+مخزن JSON مع SQLite لتسلسل عشوائي من العمليات.
+"""
+import json
+import multiprocessing
+import os
+import random
+
+import pytest
+
+import college_store
+from college_records import COLLEGE_FIELDS, College
+from college_store import JsonCollegeStore, SqliteCollegeStore, StaleEditError, compute_totals
+
+
+def restart():
+    """محاكاة إعادة تشغيل العملية: نسيان الذاكرة المؤقتة المشتركة"""
+    college_store._colleges_cache.clear()
+
+
+def state(store):
+    """محتوى المخزن دون أرقام الإصدارات (تختلف طريقة ترقيمها بين المخزنين)"""
+    return [
+        (c.name, *(getattr(c, field) for field in COLLEGE_FIELDS), c.departments)
+        for c in store.load()['colleges']
+    ]
+
+
+def fill(store):
+    store.add_college(College('كلية الهندسة', 100, 5, departments=('مدني', 'كهرباء')))
+    store.add_college(College('كلية الطب', 200, 7))
+    store.bulk_upsert([
+        {'name': 'كلية الطب', 'graduate_students': 9, 'departments': ['جراحة']},
+        {'name': 'كلية العلوم', 'students_count': 50, 'departments': ['فيزياء', 'فيزياء']},
+    ])
+    store.update_college('كلية الهندسة', {'name': 'كلية الهندسة', 'students_count': 120})
+    store.add_department('كلية العلوم', 'كيمياء')
+    store.remove_department('كلية الهندسة', 'مدني')
+    store.delete_college('كلية الطب')
+
+
+EXPECTED = [
+    ('كلية الهندسة', 120, 5, 0, 0, 0, 0, ('كهرباء',)),
+    ('كلية العلوم', 50, 0, 0, 0, 0, 0, ('فيزياء', 'كيمياء')),
+]
+
+
+@pytest.fixture
+def json_store(tmp_path):
+    return JsonCollegeStore(str(tmp_path / 'colleges.json'), compact_threshold=10 ** 9)
+
+
+def test_journal_replayed_after_restart(json_store):
+    fill(json_store)
+    assert state(json_store) == EXPECTED
+    restart()
+    assert state(json_store) == EXPECTED
+    assert json_store.load()['totals'] == compute_totals(json_store.load()['colleges'])
+
+
+def test_torn_tail_is_ignored_and_truncated(json_store):
+    fill(json_store)
+    with open(json_store.journal_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "delete", "name": "كلية')
+    restart()
+    assert state(json_store) == EXPECTED
+    json_store.add_department('كلية العلوم', 'رياضيات')
+    restart()
+    assert state(json_store)[1][-1] == ('فيزياء', 'كيمياء', 'رياضيات')
+    with open(json_store.journal_path, 'rb') as f:
+        assert all(json.loads(line) for line in f)
+
+
+@pytest.mark.parametrize('binary_snapshot', [False, True])
+def test_compaction_preserves_data(tmp_path, binary_snapshot):
+    store = JsonCollegeStore(
+        str(tmp_path / 'colleges.json'), compact_threshold=10 ** 9, binary_snapshot=binary_snapshot
+    )
+    fill(store)
+    version = store.data_version()
+    store.compact()
+    assert not os.path.exists(store.journal_path)
+    restart()
+    assert state(store) == EXPECTED
+    assert store.data_version() == version
+
+
+def test_compaction_interrupted_after_rotating_journal(json_store):
+    fill(json_store)
+    # انقطاع الدمج بعد تدوير السجل وقبل كتابة اللقطة
+    os.replace(json_store.journal_path, json_store.compacting_path)
+    restart()
+    assert state(json_store) == EXPECTED
+    json_store.add_department('كلية العلوم', 'رياضيات')
+    restart()
+    assert state(json_store)[1][-1] == ('فيزياء', 'كيمياء', 'رياضيات')
+    json_store.compact()
+    restart()
+    assert state(json_store)[1][-1] == ('فيزياء', 'كيمياء', 'رياضيات')
+
+
+def test_compaction_interrupted_before_replacing_snapshot(json_store, monkeypatch):
+    json_store.add_college(College('كلية الآداب', 10))
+    json_store.compact()
+    fill(json_store)
+    expected = [('كلية الآداب', 10, 0, 0, 0, 0, 0, ())] + EXPECTED
+
+    real_replace = os.replace
+
+    def crash_on_snapshot(src, dst):
+        if dst == json_store.file_path:
+            raise OSError("انقطاع محاكى")
+        real_replace(src, dst)
+
+    # كُتبت البيانات الوصفية الجديدة لكن بقيت اللقطة القديمة والسجل المُدوّر
+    monkeypatch.setattr(college_store.os, 'replace', crash_on_snapshot)
+    with pytest.raises(OSError):
+        json_store.compact()
+    monkeypatch.undo()
+    restart()
+    assert state(json_store) == expected
+    json_store.compact()
+    restart()
+    assert state(json_store) == expected
+
+
+def test_unappliable_entry_is_not_journaled(json_store):
+    fill(json_store)
+    with pytest.raises(ValueError):
+        json_store.bulk_upsert([{'name': 'كلية جديدة', 'students_count': 5, 'notes': 'hi'}])
+    restart()
+    assert state(json_store) == EXPECTED
+
+
+def test_unappliable_journal_entry_is_skipped_and_rejected(json_store):
+    fill(json_store)
+    bad = {'op': 'upsert', 'colleges': [{'name': 'كلية', 'notes': 'x'}], 'v': json_store.data_version() + 1}
+    with open(json_store.journal_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(bad, ensure_ascii=False) + '\n')
+    restart()
+    assert state(json_store) == EXPECTED
+    json_store.add_department('كلية العلوم', 'رياضيات')
+    json_store.compact()
+    restart()
+    assert state(json_store)[1][-1] == ('فيزياء', 'كيمياء', 'رياضيات')
+    with open(json_store.rejected_path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [bad]
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_stale_edit_is_detected(tmp_path, backend):
+    store = make_store(tmp_path, backend)
+    store.add_college(College('كلية الهندسة', 100))
+    version = store.load()['index']['كلية الهندسة'].version
+    store.update_college('كلية الهندسة', {'name': 'كلية الهندسة', 'students_count': 1},
+                         expected_version=version)
+    with pytest.raises(StaleEditError):
+        store.update_college('كلية الهندسة', {'name': 'كلية الهندسة', 'students_count': 2},
+                             expected_version=version)
+    assert store.load()['index']['كلية الهندسة'].students_count == 1
+
+
+def make_store(tmp_path, backend):
+    if backend == 'json':
+        # عتبة دمج صغيرة حتى يتداخل الدمج في الخلفية مع الكتابة
+        return JsonCollegeStore(str(tmp_path / 'colleges.json'), compact_threshold=2048)
+    return SqliteCollegeStore(str(tmp_path / 'colleges.db'))
+
+
+def _write_departments(backend, tmp_path, worker, count):
+    store = make_store(tmp_path, backend)
+    for i in range(count):
+        store.add_department('كلية الهندسة', f"قسم {worker}-{i}")
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_concurrent_writers_in_separate_processes(tmp_path, backend):
+    store = make_store(tmp_path, backend)
+    store.add_college(College('كلية الهندسة'))
+    context = multiprocessing.get_context('fork')
+    workers = [
+        context.Process(target=_write_departments, args=(backend, tmp_path, worker, 25))
+        for worker in range(4)
+    ]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+    restart()
+    if backend == 'json':
+        store.compact()
+        restart()
+    departments = store.load()['index']['كلية الهندسة'].departments
+    assert sorted(departments) == sorted(f"قسم {w}-{i}" for w in range(4) for i in range(25))
+
+
+def _random_operation(rng, names):
+    name = rng.choice(names)
+    departments = rng.sample(['أ', 'ب', 'ج', 'د'], rng.randrange(3))
+    op = rng.randrange(6)
+    if op == 0:
+        return 'add_college', (College(name, rng.randrange(100), rng.randrange(10),
+                                       departments=tuple(departments)),)
+    if op == 1:
+        return 'bulk_upsert', ([
+            {'name': rng.choice(names), 'students_count': rng.randrange(100),
+             'departments': rng.choices(['أ', 'ب', 'هـ'], k=2)}
+            for _ in range(3)
+        ],)
+    if op == 2:
+        return 'update_college', (name, {'name': rng.choice(names), 'dorm_students': rng.randrange(9)},
+                                  departments if rng.random() < 0.5 else None)
+    if op == 3:
+        return 'add_department', (name, rng.choice('أبجدهـ'))
+    if op == 4:
+        return 'remove_department', (name, rng.choice('أبجدهـ'))
+    return 'delete_college', (name,)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_json_and_sqlite_stores_agree(tmp_path, seed):
+    rng = random.Random(seed)
+    names = [f"كلية {i}" for i in range(6)]
+    json_store = JsonCollegeStore(str(tmp_path / 'colleges.json'), compact_threshold=4096)
+    sqlite_store = SqliteCollegeStore(str(tmp_path / 'colleges.db'))
+    for step in range(200):
+        method, args = _random_operation(rng, names)
+        getattr(json_store, method)(*args)
+        getattr(sqlite_store, method)(*args)
+        if step % 20 == 0:
+            restart()
+        assert state(json_store) == state(sqlite_store), (step, method, args)
+        assert json_store.load()['totals'] == sqlite_store.load()['totals']
+    assert json_store.load()['totals'] == compute_totals(json_store.load()['colleges'])
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+@pytest.mark.parametrize('record', [
+    {'students_count': 5},
+    {'name': 'كلية', 'notes': 'hi'},
+    {'name': 'كلية', 'students_count': 'abc'},
+    {'name': 'كلية', 'students_count': 2.5},
+    {'name': 'كلية', 'students_count': -1},
+    {'name': 'كلية', 'students_count': 10 ** 23},
+    {'name': 'كلية', 'departments': 'قسم'},
+])
+def test_bulk_upsert_rejects_invalid_records(tmp_path, backend, record):
+    store = make_store(tmp_path, backend)
+    store.add_college(College('كلية الهندسة', 100))
+    with pytest.raises(ValueError, match='السجل رقم 2'):
+        store.bulk_upsert([{'name': 'كلية الهندسة', 'students_count': 1}, record])
+    restart()
+    assert state(store) == [('كلية الهندسة', 100, 0, 0, 0, 0, 0, ())]
+    store.bulk_upsert([{'name': 'كلية', 'students_count': '7', 'dorm_students': 3.0}])
+    assert state(store)[1] == ('كلية', 7, 0, 0, 3, 0, 0, ())
+
+
+def test_sqlite_totals_table_built_for_existing_database(tmp_path):
+    path = str(tmp_path / 'colleges.db')
+    store = SqliteCollegeStore(path)
+    fill(store)
+    conn = store._connection()
+    # قاعدة من إصدار لم يكن فيه جدول المجاميع
+    conn.execute("DELETE FROM totals")
+    conn.execute("DELETE FROM meta WHERE key = 'totals_table'")
+    store = SqliteCollegeStore(path)
+    store.add_department('كلية العلوم', 'رياضيات')
+    restart()
+    assert store.load()['totals'] == compute_totals(store.load()['colleges'])